@@ -0,0 +1,328 @@
+import itertools
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# The shared Intcode VM lives in 2019/intcode
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import BoundedMemory, Computer, OpcodeNotFound, load_program
+from intcode.batch import BatchComputer
+
+
+class SymbolicControlFlow(Exception):
+    """The program used a noun/verb dependent value as an opcode or address."""
+    pass
+
+
+opcode_dict = {
+    1: 'ADD',
+    2: 'MULTIPLY',
+    99: 'STOP',
+}
+
+
+# The program and a VM to run it, set up once in each worker process
+_worker_program: List[int] = []
+_worker_computer: Optional[Computer] = None
+
+
+def _init_worker(opcodes: List[int]) -> None:
+    global _worker_program, _worker_computer
+    _worker_program = opcodes
+    # Day 2 programs are small, so a plain list copy per run is cheapest
+    _worker_computer = Computer(opcodes, memory=list, operations=opcode_dict)
+
+
+def _run(computer: Computer, noun: int, verb: int) -> Optional[int]:
+    # Output of the run, or None if the inputs turn the program into garbage
+    computer.opcodes[1] = noun
+    computer.opcodes[2] = verb
+    try:
+        computer.process()
+    except (OpcodeNotFound, IndexError):
+        return None
+    return computer.opcodes[0]
+
+
+def _matches(opcodes: List[int], noun: int, verb: int, target_output: int) -> bool:
+    """
+    Check a candidate on memory bounded to the program, where negative
+    addresses fail too (a plain list counts them from the end), as they
+    do in solve() and batch_search().
+    """
+    computer = Computer(opcodes, memory=BoundedMemory, operations=opcode_dict)
+    return _run(computer, noun, verb) == target_output
+
+
+def _search_chunk(candidates: List[Tuple[int, int]], target_output: int
+                  ) -> Optional[Tuple[int, int]]:
+    computer = _worker_computer
+    for noun, verb in candidates:
+        computer.reload(_worker_program)
+        if _run(computer, noun, verb) == target_output and \
+                _matches(_worker_program, noun, verb, target_output):
+            return noun, verb
+    return None
+
+
+def _chunks(nouns: Iterable[int], verbs: Iterable[int], chunk_size: int
+            ) -> Iterator[List[Tuple[int, int]]]:
+    candidates = ((noun, verb) for verb in verbs for noun in nouns)
+    while True:
+        chunk = list(itertools.islice(candidates, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def search(opcodes: List[int], target_output: int,
+           nouns: Iterable[int] = range(1, 100), verbs: Iterable[int] = range(1, 100),
+           workers: Optional[int] = None, chunk_size: int = 256) -> Optional[Tuple[int, int]]:
+    """
+    Find a (noun, verb) pair that makes the program leave target_output
+    in position 0, running chunks of candidates across a process pool.
+
+    The program is sent to each worker once. At most a few chunks per
+    worker are in flight at a time, and whatever has not started yet is
+    cancelled as soon as any chunk finds a match. If several pairs match,
+    whichever is found first is returned. Returns None if none match.
+    """
+    nouns = list(nouns)
+    verbs = list(verbs)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 4 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(opcodes,)) as executor:
+        chunks = _chunks(nouns, verbs, chunk_size)
+        in_flight = set()
+        while True:
+            for chunk in itertools.islice(chunks, max_in_flight - len(in_flight)):
+                in_flight.add(executor.submit(_search_chunk, chunk, target_output))
+            if not in_flight:
+                return None
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return result
+
+
+def batch_search(opcodes: List[int], target_output: int,
+                 nouns: Iterable[int] = range(1, 100), verbs: Iterable[int] = range(1, 100)
+                 ) -> Optional[Tuple[int, int]]:
+    """
+    Same as search, but runs every (noun, verb) pair as one lane of a
+    single BatchComputer (needs numpy). Lanes only split up where the
+    program branches on noun or verb, so most instructions run once for
+    all pairs. Matches are checked again on a Computer, in search order,
+    with the same bounded memory as search().
+    """
+    candidates = [(noun, verb) for verb in verbs for noun in nouns]
+    if not candidates:
+        return None
+    batch = BatchComputer(opcodes, len(candidates), operations=opcode_dict)
+    batch.memory[:, 1] = [noun for noun, _ in candidates]
+    batch.memory[:, 2] = [verb for _, verb in candidates]
+    batch.process()
+
+    for lane in (batch.halted & (batch.memory[:, 0] == target_output)).nonzero()[0]:
+        noun, verb = candidates[lane]
+        if _matches(opcodes, noun, verb, target_output):
+            return noun, verb
+    return None
+
+
+def _brute_force(opcodes: List[int], target_output: int,
+                 nouns: Iterable[int], verbs: Iterable[int]) -> Optional[Tuple[int, int]]:
+    try:
+        return batch_search(opcodes, target_output, nouns, verbs)
+    except ImportError:
+        return search(opcodes, target_output, nouns, verbs)
+
+
+# A polynomial in noun and verb, mapping (noun power, verb power) to its
+# coefficient. Terms with a zero coefficient are never stored. None stands
+# for a value read from an address that depends on noun or verb, which is
+# fine as long as the program never actually uses it.
+Polynomial = Optional[Dict[Tuple[int, int], int]]
+
+NOUN: Polynomial = {(1, 0): 1}
+VERB: Polynomial = {(0, 1): 1}
+
+
+def _constant(value: int) -> Polynomial:
+    return {(0, 0): value} if value else {}
+
+
+def _is_concrete(polynomial: Polynomial) -> bool:
+    return polynomial is not None and all(powers == (0, 0) for powers in polynomial)
+
+
+def _concrete(polynomial: Polynomial) -> int:
+    if not _is_concrete(polynomial):
+        raise SymbolicControlFlow
+    return polynomial.get((0, 0), 0)
+
+
+def _add(p1: Polynomial, p2: Polynomial) -> Polynomial:
+    if p1 is None or p2 is None:
+        return None
+    result = dict(p1)
+    for powers, coefficient in p2.items():
+        result[powers] = result.get(powers, 0) + coefficient
+        if result[powers] == 0:
+            del result[powers]
+    return result
+
+
+def _multiply(p1: Polynomial, p2: Polynomial) -> Polynomial:
+    if p1 is None or p2 is None:
+        return None
+    result: Polynomial = {}
+    for (noun_1, verb_1), coefficient_1 in p1.items():
+        for (noun_2, verb_2), coefficient_2 in p2.items():
+            result = _add(result, {(noun_1 + noun_2, verb_1 + verb_2):
+                                   coefficient_1 * coefficient_2})
+    return result
+
+
+def _evaluate(polynomial: Polynomial, noun: int, verb: int) -> int:
+    return sum(coefficient * noun ** noun_power * verb ** verb_power
+               for (noun_power, verb_power), coefficient in polynomial.items())
+
+
+class SymbolicComputer():
+    """
+    Runs a program once with opcodes[1] and opcodes[2] left as the symbols
+    noun and verb, so that every cell of memory ends up as a polynomial in
+    the two. Reading through a symbolic address is allowed (the value is
+    unknown, and the address is kept in symbolic_reads so that its bounds
+    can be checked later) but using an unknown value as an opcode or
+    address, or writing through a symbolic address, raises
+    SymbolicControlFlow.
+    """
+    def __init__(self, opcodes: List[int]):
+        self.opcodes = [_constant(x) for x in opcodes]
+        self.opcodes[1] = NOUN
+        self.opcodes[2] = VERB
+        self.instruction_pointer = 0
+        self.keep_running = True
+        self.symbolic_reads: List[Polynomial] = []
+
+    def process(self) -> None:
+        while self.keep_running:
+            self._process_opcode(self.instruction_pointer)
+            self.instruction_pointer += 4
+
+    def _address(self, position: int) -> int:
+        # Negative addresses fail, as they do on BoundedMemory, instead of
+        # counting from the end of the list
+        if position < 0:
+            raise IndexError('negative address {}'.format(position))
+        return position
+
+    def _read(self, position: Polynomial) -> Polynomial:
+        if _is_concrete(position):
+            return self.opcodes[self._address(_concrete(position))]
+        if position is None:
+            raise SymbolicControlFlow
+        self.symbolic_reads.append(position)
+        return None
+
+    def _arithmetic_opcode(self, index: int, operation: str) -> None:
+        value_1 = self._read(self.opcodes[index + 1])
+        value_2 = self._read(self.opcodes[index + 2])
+        position_3 = self._address(_concrete(self.opcodes[index + 3]))
+
+        if operation == 'ADD':
+            result = _add(value_1, value_2)
+        elif operation == 'MULTIPLY':
+            result = _multiply(value_1, value_2)
+
+        self.opcodes[position_3] = result
+
+    def _process_opcode(self, index: int) -> None:
+        opcode = _concrete(self.opcodes[index])
+        try:
+            operation = opcode_dict[opcode]
+            if operation == 'ADD' or operation == 'MULTIPLY':
+                self._arithmetic_opcode(index, operation)
+            elif operation == 'STOP':
+                self.keep_running = False
+        except KeyError:
+            raise OpcodeNotFound
+
+
+def solve(opcodes: List[int], target_output: int,
+          nouns: Iterable[int] = range(1, 100), verbs: Iterable[int] = range(1, 100)
+          ) -> Optional[Tuple[int, int]]:
+    """
+    Find a (noun, verb) pair that makes the program leave target_output in
+    position 0 with a single symbolic run instead of a run per pair. For
+    each noun, the output is solved for the verb directly when it is at
+    most linear in the verb, and evaluated per verb otherwise (still no
+    VM runs). Falls back to a brute force search, batched when numpy is
+    available, if control flow depends on the noun or verb.
+    """
+    computer = SymbolicComputer(opcodes)
+    try:
+        computer.process()
+    except SymbolicControlFlow:
+        return _brute_force(opcodes, target_output, nouns, verbs)
+    except (OpcodeNotFound, IndexError):
+        # Execution never depended on noun or verb, so every pair fails
+        return None
+
+    output = computer.opcodes[0]
+    if output is None:  # read through a symbolic address
+        return _brute_force(opcodes, target_output, nouns, verbs)
+
+    def in_bounds(noun: int, verb: int) -> bool:
+        # A concrete run would fail on any out of range symbolic read
+        return all(0 <= _evaluate(position, noun, verb) < len(opcodes)
+                   for position in computer.symbolic_reads)
+
+    verbs = list(verbs)
+    valid_verbs = set(verbs)
+    for noun in nouns:
+        # Substitute the noun, leaving a polynomial in the verb alone
+        coefficients: Dict[int, int] = {}
+        for (noun_power, verb_power), coefficient in output.items():
+            coefficients[verb_power] = (coefficients.get(verb_power, 0)
+                                        + coefficient * noun ** noun_power)
+        degree = max((power for power, coefficient in coefficients.items() if coefficient),
+                     default=0)
+
+        if degree == 0:
+            candidates = verbs if coefficients.get(0, 0) == target_output else []
+        elif degree == 1:
+            verb, leftover = divmod(target_output - coefficients.get(0, 0), coefficients[1])
+            candidates = [verb] if leftover == 0 and verb in valid_verbs else []
+        else:
+            candidates = [verb for verb in verbs
+                          if _evaluate(output, noun, verb) == target_output]
+
+        for verb in candidates:
+            if in_bounds(noun, verb):
+                return noun, verb
+    return None
+
+
+if __name__=="__main__":
+    # Parsed and decoded once, then loaded from the on-disk cache
+    opcodes = load_program('input.txt')
+
+    #opcodes = [1,9,10,3,2,3,11,0,99,30,40,50]  # test case
+    target_output = 19690720
+
+    # Solved from one symbolic run when possible. Otherwise it's the O(N*M)
+    # solution spread across every core, where each worker reloads one VM
+    # with a fresh copy of the program for every run.
+    result = solve(opcodes, target_output)
+    if result is not None:
+        noun, verb = result
+        print(100 * noun + verb)
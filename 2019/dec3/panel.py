@@ -1,7 +1,33 @@
-from typing import List, Union
+import argparse
+
+from typing import Dict, KeysView, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional, only SparseGrid(vectorized=True) needs it
+    np = None
+
+from segments import DIRECTIONS, closest_crossing, closest_crossings
+
+
+# A point's coordinates packed into one int, x in the high bits. Keys
+# fit in an int64 while both coordinates are within +/- 2 ** 31.
+COORDINATE_BITS = 32
+_COORDINATE_MASK = (1 << COORDINATE_BITS) - 1
+_COORDINATE_OFFSET = 1 << (COORDINATE_BITS - 1)
+
+
+def pack(x: int, y: int) -> int:
+    return (x << COORDINATE_BITS) | (y + _COORDINATE_OFFSET)
+
+
+def unpack(key: int) -> Tuple[int, int]:
+    return key >> COORDINATE_BITS, (key & _COORDINATE_MASK) - _COORDINATE_OFFSET
 
 
 class Point():
+    __slots__ = ('x', 'y', 'num_steps')
+
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
@@ -20,37 +46,98 @@ class Point():
     def __repr__(self) -> str:
         return 'Point({}, {})'.format(self.x, self.y)
 
-    def __hash__(self) -> str:  # need for set operations later
-        return hash(self.x + self.y)
+    def __hash__(self) -> int:  # need for set operations later
+        return hash(self.key)
+
+    @property
+    def key(self) -> int:
+        return pack(self.x, self.y)
 
 
 STARTING_POINT = Point(0, 0)
 
 
 class SparseGrid():
-    def __init__(self, path: List[str]) -> None:
+    """
+    Every point a wire visits, in order. With vectorized=True (needs numpy)
+    the path is traced into coordinate arrays in a few array operations,
+    and the points and the lookup index are only built from them if asked
+    for; shared_visits() works on the arrays directly.
+    """
+    def __init__(self, path: List[str], vectorized: bool = False) -> None:
         self._counter: int = 0
         self.path: str = path
-        self.points: List = []
-        self._construct_visited_points()
+        self._points: Optional[List[Point]] = None
+        self._xs = None
+        self._ys = None
+        # Sorted packed coordinates of the points visited, and num_steps
+        # at the first visit of each (vectorized tracing only)
+        self._unique_keys = None
+        self._first_steps = None
+        # packed coordinates -> num_steps when the path first got there
+        self._index: Optional[Dict[int, int]] = None
+        if vectorized:
+            if np is None:
+                raise ImportError('vectorized tracing needs numpy')
+            self._trace_vectorized()
+        else:
+            self._construct_visited_points()
+
+    @property
+    def points(self) -> List[Point]:
+        if self._points is None:
+            self._points = []
+            for num_steps, (x, y) in enumerate(zip(self._xs.tolist(), self._ys.tolist()), 1):
+                point = Point(x, y)
+                point.num_steps = num_steps
+                self._points.append(point)
+        return self._points
+
+    @property
+    def _first_visits(self) -> Dict[int, int]:
+        if self._index is None:
+            self._index = dict(zip(self._unique_keys.tolist(), self._first_steps.tolist()))
+        return self._index
 
     def __getitem__(self, p: Union[int, Point]):
         # Allow fetching points by position in the path.
         if isinstance(p, int):
             return self.points[p]
 
-        # There can be multiple matches since the path may visit the
-        # same point multiple times. Since what we care about is the
-        # minimum num_steps point, we return that.
-        matches = []
-        for point in self.points:
-            if p == point:
-                matches.append(point)
+        # The path may visit the same point multiple times. Since what
+        # we care about is the minimum num_steps point, the index keeps
+        # the first visit and we return that.
+        try:
+            return self.first_visit(p.key)
+        except KeyError:
+            raise KeyError('{} not found in SparseGrid'.format(p)) from None
+
+    def __contains__(self, p: Point) -> bool:
+        return p.key in self._first_visits
+
+    def keys(self) -> KeysView[int]:
+        """Packed coordinates of every point visited, as a set-like view."""
+        return self._first_visits.keys()
 
-        if len(matches) != 0:
-            return min(matches)
+    def first_visit(self, key: int) -> Point:
+        point = Point(*unpack(key))
+        point.num_steps = self._first_visits[key]
+        return point
+
+    def shared_visits(self, other: 'SparseGrid') -> Tuple[List[int], List[int], List[int]]:
+        """
+        Packed coordinates of the points both grids visit, with the
+        num_steps of the first visit in this grid and in other.
+        """
+        if self._unique_keys is not None and other._unique_keys is not None:
+            keys, own, theirs = np.intersect1d(self._unique_keys, other._unique_keys,
+                                               assume_unique=True, return_indices=True)
+            return keys.tolist(), self._first_steps[own].tolist(), \
+                other._first_steps[theirs].tolist()
 
-        raise KeyError('{} not found in SparseGrid'.format(p))
+        keys = list(self.keys() & other.keys())
+        return keys, [self._first_visits[key] for key in keys], \
+            [other._first_visits[key] for key in keys]
 
     def __repr__(self) -> str:
         return 'SparseGrid({})'.format(self.path)
@@ -76,10 +163,12 @@ class SparseGrid():
         elif direction == 'R':
             point = Point(prev_x + 1, prev_y)
 
-        self.points.append(point)
+        self._points.append(point)
         return point
 
     def _construct_visited_points(self):
+        self._points = []
+        self._index = {}
         prev_point = STARTING_POINT
         total_steps = 0
         for step in self.path:
@@ -90,15 +179,41 @@ class SparseGrid():
                 total_steps += 1
                 point = self._add_point(direction, prev_point.x, prev_point.y)
                 point.num_steps = total_steps
+                # Steps only grow along the path, so the first visit is the minimum
+                self._first_visits.setdefault(point.key, total_steps)
                 num_moves -= 1
                 prev_point = point
 
+    def _trace_vectorized(self):
+        # One row per move in the path, then one per unit step of it
+        lengths = np.array([int(step[1:]) for step in self.path], dtype=np.int64)
+        deltas = np.array([DIRECTIONS[step[0]] for step in self.path],
+                          dtype=np.int64).reshape(-1, 2)
+        steps = np.repeat(deltas, lengths, axis=0)
+        self._xs = np.cumsum(steps[:, 0])
+        self._ys = np.cumsum(steps[:, 1])
+
+        keys = (self._xs << COORDINATE_BITS) | (self._ys + _COORDINATE_OFFSET)
+        # np.unique gives the index of each key's first occurrence, which
+        # is its first visit since steps only grow along the path
+        self._unique_keys, first_indexes = np.unique(keys, return_index=True)
+        self._first_steps = first_indexes + 1
+
 
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p2.x - p1.x) + abs(p2.y - p1.y)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dense', action='store_true',
+                        help='trace every point of the wires instead of their segments')
+    parser.add_argument('--numpy', action='store_true',
+                        help='with --dense, trace the wires with numpy')
+    parser.add_argument('--all', action='store_true',
+                        help='report crossings between every pair of wires in the input')
+    args = parser.parse_args()
+
     with open('input.txt', 'r') as f:
         input_ = f.readlines()
 
@@ -111,19 +226,33 @@ if __name__ == '__main__':
     #wire_1 = 'R98,U47,R26,D63,R33,U87,L62,D20,R33,U53,R51'.split(',')
     #wire_2 = 'U98,R91,D20,R16,D67,R40,U7,R15,U6,R7'.split(',')
 
-    # make a grid, mark points that are visited. Do not mark initial point.
-    # matrix would be sparse so instead of a huge matrix let's store sparse grids
-    # (yes I could use numpy/scipy but I'm intentionally not because
-    # this is a programming exercise.)
-    sparse_grid_1 = SparseGrid(wire_1)
-    sparse_grid_2 = SparseGrid(wire_2)
+    if args.all:
+        # Every line of the input is a wire, and they're all swept together
+        paths = [line.split(',') for line in input_ if line.strip()]
+        for (wire_a, wire_b), (min_distance, min_steps) in sorted(
+                closest_crossings(paths).items()):
+            print('wires {} and {}: min manhattan distance: {}, fewest combined steps: {}'.format(
+                wire_a, wire_b, min_distance, min_steps))
+    elif args.dense:
+        # make a grid, mark points that are visited. Do not mark initial point.
+        # matrix would be sparse so instead of a huge matrix let's store sparse grids
+        # (yes I could use numpy/scipy but I'm intentionally not because
+        # this is a programming exercise.)
+        sparse_grid_1 = SparseGrid(wire_1, args.numpy)
+        sparse_grid_2 = SparseGrid(wire_2, args.numpy)
 
-    intersecting_points = list(set(sparse_grid_1.points) & set(sparse_grid_2.points))
+        intersecting_keys, steps_1, steps_2 = sparse_grid_1.shared_visits(sparse_grid_2)
+        intersecting_points = [Point(*unpack(key)) for key in intersecting_keys]
 
-    dists_to_start = [manhattan_distance(x, STARTING_POINT) for x in intersecting_points]
+        dists_to_start = [manhattan_distance(x, STARTING_POINT) for x in intersecting_points]
 
-    combined_steps = [sparse_grid_1[x].num_steps + sparse_grid_2[x].num_steps 
-                      for x in intersecting_points]
+        combined_steps = [x + y for x, y in zip(steps_1, steps_2)]
 
-    print('min manhattan distance: {}'.format(min(dists_to_start)))
-    print('fewest combined steps: {}'.format(min(combined_steps)))
+        print('min manhattan distance: {}'.format(min(dists_to_start)))
+        print('fewest combined steps: {}'.format(min(combined_steps)))
+    else:
+        # Only the corners of the wires are stored, so this stays small
+        # however long the wires get
+        min_distance, min_steps = closest_crossing(wire_1, wire_2)
+        print('min manhattan distance: {}'.format(min_distance))
+        print('fewest combined steps: {}'.format(min_steps))
@@ -0,0 +1,252 @@
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+
+# direction -> (dx, dy)
+DIRECTIONS = {'U': (0, 1), 'D': (0, -1), 'L': (-1, 0), 'R': (1, 0)}
+
+
+class Segment():
+    """
+    One straight run of a wire, length unit moves in direction from
+    (start_x, start_y). It covers the points one move past the start up
+    to its end; the start itself belongs to the previous segment (or is
+    the origin, which no wire visits at step 0). steps is the wire's step
+    count at the start.
+
+    line is the fixed coordinate (y for a horizontal segment, x for a
+    vertical one) and lo..hi the covered range along the other axis.
+    """
+    def __init__(self, wire: int, start_x: int, start_y: int, direction: str, length: int,
+                 steps: int):
+        dx, dy = DIRECTIONS[direction]
+        self.wire = wire
+        self.horizontal = dy == 0
+        self.steps = steps
+        self.length = length
+        if self.horizontal:
+            self.line, self.start, step = start_y, start_x, dx
+        else:
+            self.line, self.start, step = start_x, start_y, dy
+        first = self.start + step
+        last = self.start + step * length
+        self.lo, self.hi = min(first, last), max(first, last)
+
+    def __repr__(self) -> str:
+        axis = 'y' if self.horizontal else 'x'
+        return 'Segment(wire {}, {}={}, {}..{})'.format(self.wire, axis, self.line,
+                                                        self.lo, self.hi)
+
+    def steps_at(self, position: int) -> int:
+        """Steps taken by the wire to reach position along this segment."""
+        return self.steps + abs(position - self.start)
+
+
+class Crossing():
+    """A point where two different wires meet, with each wire's steps there."""
+    def __init__(self, x: int, y: int, wire_1: int, steps_1: int, wire_2: int, steps_2: int):
+        self.x = x
+        self.y = y
+        self.wire_1 = wire_1
+        self.steps_1 = steps_1
+        self.wire_2 = wire_2
+        self.steps_2 = steps_2
+
+    def __repr__(self) -> str:
+        return 'Crossing({}, {}, wires {} and {})'.format(self.x, self.y,
+                                                          self.wire_1, self.wire_2)
+
+    @property
+    def distance(self) -> int:
+        return abs(self.x) + abs(self.y)
+
+    @property
+    def combined_steps(self) -> int:
+        return self.steps_1 + self.steps_2
+
+
+def trace(path: List[str], wire: int = 0) -> List[Segment]:
+    """Turn a wire's moves (e.g. 'R75') into segments, starting at the origin."""
+    segments = []
+    x, y = 0, 0
+    steps = 0
+    for move in path:
+        direction = move[0]
+        length = int(move[1:])
+        if length == 0:
+            continue
+        segments.append(Segment(wire, x, y, direction, length, steps))
+        dx, dy = DIRECTIONS[direction]
+        x += dx * length
+        y += dy * length
+        steps += length
+    return segments
+
+
+def _crossing(horizontal: Segment, vertical: Segment) -> Crossing:
+    x, y = vertical.line, horizontal.line
+    steps_h = horizontal.steps_at(x)
+    steps_v = vertical.steps_at(y)
+    if horizontal.wire < vertical.wire:
+        return Crossing(x, y, horizontal.wire, steps_h, vertical.wire, steps_v)
+    return Crossing(x, y, vertical.wire, steps_v, horizontal.wire, steps_h)
+
+
+class _Occupancy():
+    """
+    How many items sit in each of size slots, with log-time updates and a
+    log-time search for the next slot holding any (a Fenwick tree).
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self._top = 1 << (size.bit_length() - 1) if size else 0
+
+    def add(self, slot: int, count: int) -> None:
+        i = slot + 1
+        while i <= self.size:
+            self._tree[i] += count
+            i += i & -i
+
+    def _before(self, slot: int) -> int:
+        # Items in the slots before slot
+        total = 0
+        i = slot
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def next_occupied(self, slot: int) -> int:
+        """The first slot from slot on that holds an item, or size if none does."""
+        remaining = self._before(slot)
+        position = 0
+        step = self._top
+        while step:
+            if position + step <= self.size and self._tree[position + step] <= remaining:
+                position += step
+                remaining -= self._tree[position]
+            step >>= 1
+        return position
+
+
+def _perpendicular_crossings(horizontals: List[Segment],
+                             verticals: List[Segment]) -> Iterator[Crossing]:
+    # Sweep a vertical line left to right. Horizontal segments are active
+    # while the sweep is within their x range, filed under their y, and
+    # each vertical segment walks the occupied ys in its y range.
+    INSERT, QUERY, REMOVE = 0, 1, 2
+    events = []
+    for number, segment in enumerate(horizontals):
+        events.append((segment.lo, INSERT, number))
+        events.append((segment.hi, REMOVE, number))
+    for number, segment in enumerate(verticals):
+        events.append((segment.line, QUERY, number))
+    events.sort()
+
+    ys = sorted({segment.line for segment in horizontals})
+    slots = {y: slot for slot, y in enumerate(ys)}
+    occupancy = _Occupancy(len(ys))
+    # Numbers of the active horizontals, by the slot of their y
+    active: List[Dict[int, None]] = [{} for _ in ys]
+    for _, kind, number in events:
+        if kind == INSERT:
+            slot = slots[horizontals[number].line]
+            active[slot][number] = None
+            occupancy.add(slot, 1)
+        elif kind == REMOVE:
+            slot = slots[horizontals[number].line]
+            del active[slot][number]
+            occupancy.add(slot, -1)
+        else:
+            vertical = verticals[number]
+            slot = occupancy.next_occupied(bisect_left(ys, vertical.lo))
+            while slot < len(ys) and ys[slot] <= vertical.hi:
+                for other in active[slot]:
+                    horizontal = horizontals[other]
+                    if horizontal.wire != vertical.wire:
+                        yield _crossing(horizontal, vertical)
+                slot = occupancy.next_occupied(slot + 1)
+
+
+def _collinear_crossings(segments: List[Segment], every_point: bool) -> Iterator[Crossing]:
+    # Segments of different wires running along the same line share every
+    # point of their overlap. Steps along an overlap change linearly, so
+    # unless every_point is asked for, its ends plus its point nearest the
+    # origin are enough for either minimum and only those are yielded.
+    lines: Dict[Tuple[bool, int], List[Segment]] = defaultdict(list)
+    for segment in segments:
+        lines[(segment.horizontal, segment.line)].append(segment)
+
+    for (horizontal, line), on_line in lines.items():
+        if len(on_line) < 2:
+            continue
+        on_line.sort(key=lambda segment: segment.lo)
+        # (hi, order, segment) of every earlier segment that may still
+        # overlap, the one that ends first on top
+        active: List[Tuple[int, int, Segment]] = []
+        for order, segment in enumerate(on_line):
+            while active and active[0][0] < segment.lo:
+                heapq.heappop(active)
+            for _, _, other in active:
+                if other.wire == segment.wire:
+                    continue
+                lo, hi = segment.lo, min(segment.hi, other.hi)
+                if every_point:
+                    positions = range(lo, hi + 1)
+                else:
+                    positions = sorted({lo, hi, min(max(0, lo), hi)})
+                first, second = sorted((segment, other), key=lambda s: s.wire)
+                for position in positions:
+                    x, y = (position, line) if horizontal else (line, position)
+                    yield Crossing(x, y, first.wire, first.steps_at(position),
+                                   second.wire, second.steps_at(position))
+            heapq.heappush(active, (segment.hi, order, segment))
+
+
+def crossings(wires: List[List[Segment]], every_point: bool = False) -> Iterator[Crossing]:
+    """
+    Every crossing between segments of different wires, for any number of
+    wires at once, in O((n + k) log n) for n segments of which k pairs
+    meet. Wires crossing themselves don't count (but are in k). Where two wires overlap along
+    a line only the points that can be closest (see _collinear_crossings)
+    are yielded, unless every_point is set.
+    """
+    segments = [segment for wire in wires for segment in wire]
+    horizontals = [segment for segment in segments if segment.horizontal]
+    verticals = [segment for segment in segments if not segment.horizontal]
+    yield from _perpendicular_crossings(horizontals, verticals)
+    yield from _collinear_crossings(segments, every_point)
+
+
+def closest_crossings(paths: List[List[str]]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """
+    For every pair of wires (by their index in paths) that cross, the
+    minimum Manhattan distance from the origin to a crossing and the
+    fewest combined steps to reach one. All the wires share one sweep,
+    rather than each pair being traced and intersected on its own.
+    """
+    closest: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    for crossing in crossings([trace(path, wire) for wire, path in enumerate(paths)]):
+        pair = (crossing.wire_1, crossing.wire_2)
+        if pair in closest:
+            min_distance, min_steps = closest[pair]
+            closest[pair] = (min(min_distance, crossing.distance),
+                             min(min_steps, crossing.combined_steps))
+        else:
+            closest[pair] = (crossing.distance, crossing.combined_steps)
+    return closest
+
+
+def closest_crossing(path_1: List[str], path_2: List[str]) -> Tuple[int, int]:
+    """
+    The minimum Manhattan distance from the origin to a crossing of the
+    two wires, and the fewest combined steps to reach one. Memory grows
+    with the number of moves in the paths, not with the wires' lengths.
+    """
+    try:
+        return closest_crossings([path_1, path_2])[(0, 1)]
+    except KeyError:
+        raise ValueError('the wires never cross') from None
@@ -1,301 +1,267 @@
+import argparse
 import itertools
+import os
+import string
 import sys
-from threading import Thread
-from queue import Queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-
-class OpcodeNotFound(Exception):
-    pass
-
-
-OPCODE_BYTE_LEN = 2
-
-
-opcode_parameter_mode = {
-    1: {'operation': 'ADD', 'nargs': 3},
-    2: {'operation': 'MULTIPLY', 'nargs': 3},
-    3: {'operation': 'INPUT', 'nargs': 1},
-    4: {'operation': 'OUTPUT', 'nargs': 1},
-    5: {'operation': 'JUMP_IF_TRUE', 'nargs': 2},
-    6: {'operation': 'JUMP_IF_FALSE', 'nargs': 2},
-    7: {'operation': 'LESS_THAN', 'nargs': 3},
-    8: {'operation': 'EQUALS', 'nargs': 3},
-}
-
-opcode_no_parameter_mode = {
-    99: {'operation': 'STOP', 'nargs': 0},
-}
-
-param_mode_dict = {
-    0: 'POSITION',
-    1: 'IMMEDIATE',
-}
-
-
-class Computer():
-    def __init__(self, opcodes: List[int], identifier: str, inputs: Queue, outputs: Queue,
-                 phase_signal: int):
-        self.opcodes = opcodes
-        self.identifier = identifier
-        self.instruction_pointer = 0
-        self.keep_running = True
-        self.inputs: Queue = inputs
-        self.outputs: Queue = outputs
-        self.phase_signal: Optional[int] = phase_signal
-
-    def process(self) -> Optional[List]:
-        while self.keep_running:
-            self._process_instruction(self.instruction_pointer)
-
-    def _process_instruction(self, index: int) -> Optional[List]:
-        opcode = self.opcodes[index]
-    
-        try:
-            op_lookup = opcode_no_parameter_mode[opcode]
-        except KeyError:
-            try:
-                opcode_str = str(opcode)
-                matching_op = opcode_str[-2:]
-                op_lookup = opcode_parameter_mode[int(opcode_str[-1])]
-            except KeyError:
-                raise OpcodeNotFound
-
-        # Process no parameter mode instructions
-        operation = op_lookup['operation']
-        opcode_str = str(opcode).zfill(OPCODE_BYTE_LEN + op_lookup['nargs'])
-        if operation == 'STOP':
-            self.keep_running = False
-
-        # Process parameter mode instructions
-        modes = []
-        for arg in reversed(range(op_lookup['nargs'])):
-            mode = param_mode_dict[int(opcode_str[arg])]
-            modes.append(mode)
-
-        if operation == 'ADD' or operation == 'MULTIPLY':
-            self._arithmetic_opcode(index, operation, modes)
-            self.instruction_pointer += 4
-        elif operation == 'INPUT':
-            self._input(index, modes)
-            self.instruction_pointer += 2
-        elif operation == 'OUTPUT':
-            self._output(index, modes)
-            self.instruction_pointer += 2
-        elif operation == 'JUMP_IF_TRUE':
-            self._jump_if_true_opcode(index, modes)
-        elif operation == 'JUMP_IF_FALSE':
-            self._jump_if_false_opcode(index, modes)
-        elif operation == 'LESS_THAN':
-            self._less_than_opcode(index, modes)
-            self.instruction_pointer += 4
-        elif operation == 'EQUALS':
-            self._equals_opcode(index, modes)
-            self.instruction_pointer += 4
-
-    def _less_than_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is less than the second parameter, it
-        stores 1 in the position given by the third parameter. Otherwise,
-        it stores 0.
-        """
-        value_1 = self._read(index + 1, modes[0])
-        value_2 = self._read(index + 2, modes[1])
-
-        if value_1 < value_2:
-            result = 1
-        else:
-            result = 0
-
-        self._write(index + 3, modes[2], result)
-
-    def _equals_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is equal to the second parameter, it
-        stores 1 in the position given by the third parameter. Otherwise,
-        it stores 0.
-        """
-        value_1 = self._read(index + 1, modes[0])
-        value_2 = self._read(index + 2, modes[1])
-
-        if value_1 == value_2:
-            result = 1
-        else:
-            result = 0
-
-        self._write(index + 3, modes[2], result)
-
-    def _jump_if_true_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is non-zero, it sets the instruction pointer
-        to the value from the second parameter. Otherwise, it does nothing.
-        """
-        value_1 = self._read(index + 1, modes[0])
-        value_2 = self._read(index + 2, modes[1])
-        if value_1 != 0:
-            self.instruction_pointer = value_2
-        else:
-            self.instruction_pointer += 3
-
-    def _jump_if_false_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is zero, it sets the instruction pointer
-        to the value from the second parameter. Otherwise, it does nothing.
-        """
-        value_1 = self._read(index + 1, modes[0])
-        value_2 = self._read(index + 2, modes[1])
-        if value_1 == 0:
-            self.instruction_pointer = value_2
-        else:
-            self.instruction_pointer += 3
-
-    def _write(self, index: int, mode: str, value: int) -> None:
-        if mode == 'POSITION':
-            position = self.opcodes[index]
-            self.opcodes[position] = value
-        elif mode == 'IMMEDIATE':
-            self.opcodes[index] = value
-
-    def _read(self, index: int, mode: str) -> int:
-        if mode == 'POSITION':
-            position = self.opcodes[index]
-            value = self.opcodes[position]
-        elif mode == 'IMMEDIATE':
-            value = self.opcodes[index]
-        return value
-
-    def _input(self, index: int, modes: List[str]) -> None:
-        if self.phase_signal:
-            input_value = self.phase_signal
-            self.phase_signal = None
-        else:
-            input_value = self.inputs.get()
-        self._write(index + 1, modes[0], input_value)
-
-    def _output(self, index: int, modes: List[str]) -> None:
-        value = self._read(index + 1, modes[0])
-        self.outputs.put(value)
-
-    def _arithmetic_opcode(self, index: int, operation: str, modes: List[str]) -> None:
-        value_1 = self._read(index + 1, modes[0])
-        value_2 = self._read(index + 2, modes[1])
-
-        if operation == 'ADD':
-            result = value_1 + value_2
-        elif operation == 'MULTIPLY':
-            result = value_1 * value_2
-
-        self._write(index + 3, modes[2], result)
+# The shared Intcode VM lives in 2019/intcode
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import (Channel, Deadlock, ENGINES, PagedMemory, ResourceLimitExceeded,
+                     load_program, run_round_robin)
 
 
 class Amplifier():
-    def __init__(self, identifier: str, phase_signal: Optional[int] = None):
+    def __init__(self, identifier: str, phase_signal: Optional[int] = None,
+                 engine: str = 'interpreter', budget: Optional[int] = None):
         self.phase_signal = phase_signal
         self.identifier = identifier
+        self.engine = engine
+        # Instruction budget for this amplifier's VM
+        self.budget = budget
         self.next = None
 
-    def compute(self, program: List[int], inputs: Queue, outputs: Queue) -> int:
-        self.computer = Computer(program.copy(), self.identifier, inputs, outputs, self.phase_signal)
-        self.computer.process()
+    def setup(self, program: PagedMemory, inputs: Channel, outputs: Channel) -> None:
+        # Copy-on-write: each amplifier only copies the pages it writes to
+        initial_inputs = [self.phase_signal] if self.phase_signal is not None else []
+        self.computer = ENGINES[self.engine]([], inputs, outputs, initial_inputs,
+                                             lambda _: program.copy())
+        self.computer.instruction_budget = self.budget
 
-    def reassign_input_queue(self, inputs: Queue) -> None:
-        self.computer.inputs = inputs
+    def compute(self, program: PagedMemory, inputs: Channel, outputs: Channel) -> int:
+        self.setup(program, inputs, outputs)
+        self.computer.process()
 
 
 class AmplificationCircuit():
     def __init__(self, program: List[int]):
+        if not isinstance(program, PagedMemory):
+            program = PagedMemory(program, page_bits=6)
         self.program = program
         self.head = None
 
-    def compute_output_signal(self) -> int:
+    def amplifiers(self) -> List[Amplifier]:
+        # Walk the linked list until it ends or loops back to the head
+        amplifiers = []
         temp = self.head
-        threads = {}
-
-        out_q = None
-        feedback_setup = False
-        # We only need to traverse the linked list once to setup the threads, queues, and
-        # start them all.
-        while temp and not feedback_setup:
-            try:
-                thread_temp = threads[temp.identifier]['thread']
-
-                # Connect the feedback loop
-                if temp.identifier == 'A' and not feedback_setup:
-                    out = threads['E']['out_q'].get()
-                    threads['A']['in_q'].put(out)
-                    threads['A']['in_q'] = threads['E']['out_q']
-                    temp.reassign_input_queue(threads['E']['out_q'])
-                    feedback_setup = True
-            except KeyError:
-                # Make the shared queues
-                in_q = Queue()
-
-                if out_q:  # Then this is not the first node
-                    in_q = out_q
-                    last_output = out_q.get()
-                    in_q.put(last_output)
-                else:  # This is the first node
-                    in_q.put(0)
-
-                out_q = Queue()
-
-                # Make the thread to run the intcode computer and set it running
-                threads[temp.identifier] = {
-                    'obj': temp,
-                    'in_q': in_q,
-                    'out_q': out_q,
-                    'thread': Thread(target = temp.compute, 
-                                     args=(self.program, in_q, out_q, ))
-                }
-                threads[temp.identifier]['thread'].start()
+        while temp and (temp is not self.head or not amplifiers):
+            amplifiers.append(temp)
             temp = temp.next
+        return amplifiers
 
-        threads['E']['thread'].join()
-        output = threads['E']['out_q'].get()
-        return output
+    def compute_output_signal(self) -> Optional[int]:
+        """
+        Run every amplifier on this thread, passing signals through Channels
+        and switching to the next amplifier whenever one waits for input.
+        Works for a plain chain as well as a feedback loop. Returns None if
+        the final amplifier never outputs anything, or if the amplifiers
+        end up all waiting on each other (one halted without passing a
+        signal on, say).
+        """
+        amplifiers = self.amplifiers()
+        feedback = amplifiers[-1].next is self.head
 
+        # channels[i] feeds amplifier i, and the last channel collects the
+        # final amplifier's output (or feeds back into the first one)
+        channels = [Channel() for _ in amplifiers]
+        if not feedback:
+            channels.append(Channel())
+        channels[0].put(0)
 
-if __name__=="__main__":
-    with open('input.txt', 'r') as f:
-        opcodes = f.read().split(',')
+        for i, amplifier in enumerate(amplifiers):
+            amplifier.setup(self.program, channels[i],
+                            channels[(i + 1) % len(channels)])
 
-    opcodes = [int(x) for x in opcodes]
-
-    # test cases
-    #opcodes = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
-    #opcodes = [3,52,1001,52,-5,52,3,53,1,52,56,54,1007,54,5,55,1005,55,26,1001,54,-5,54,1105,1,12,1,53,54,53,1008,54,0,55,1001,55,1,55,2,53,55,53,4,53,1001,56,-1,56,1005,56,6,99,0,0,0,0,10]
-
-    max_thruster_signal = 0
-    best_phase_order = []
-    for phase_order in list(itertools.permutations([9,8,7,6,5])):
-        amp = AmplificationCircuit(opcodes)
-        amp_A = Amplifier('A', phase_order[0])
-        amp.head = amp_A
+        try:
+            run_round_robin([amplifier.computer for amplifier in amplifiers])
+        except Deadlock:
+            return None
+
+        # The last signal written out by the final amplifier
+        outputs = channels[-1 if not feedback else 0].drain()
+        return outputs[-1] if outputs else None
+
+
+def build_circuit(program: List[int], phase_order: Sequence[int], feedback: bool = True,
+                  engine: str = 'interpreter', budget: Optional[int] = None
+                  ) -> AmplificationCircuit:
+    """
+    Chain up one amplifier per phase setting, named 'A', 'B', ... (or by
+    number past 'Z'), looping the last one back to the first if feedback.
+    Each amplifier may run at most budget instructions, if given.
+    """
+    circuit = AmplificationCircuit(program)
+    amplifiers = []
+    for i, phase in enumerate(phase_order):
+        identifier = string.ascii_uppercase[i] if i < 26 else str(i)
+        amplifiers.append(Amplifier(identifier, phase, engine, budget))
+
+    for amplifier, next_amplifier in zip(amplifiers, amplifiers[1:]):
+        amplifier.next = next_amplifier
+    if feedback:
+        amplifiers[-1].next = amplifiers[0]
+
+    circuit.head = amplifiers[0]
+    return circuit
+
+
+class ChainEvaluator():
+    """
+    Finds the best phase order for a chain without feedback (part 1).
+    Each amplifier there reads its phase and one signal and outputs one
+    value, so outputs are cached on (amplifier index, phase, input signal)
+    and the permutation tree is walked depth-first, so that a prefix of
+    phase settings shared by many orders is only ever run once.
+    """
+    def __init__(self, program: List[int], engine: str = 'interpreter',
+                 programs: Optional[Sequence[List[int]]] = None):
+        # programs, if given, has a separate program for each amplifier
+        if programs is None:
+            programs = [program]
+        self.programs = [PagedMemory(p, page_bits=6) for p in programs]
+        self.engine = engine
+        self.vm_runs = 0
+        self._cache: Dict[Tuple[int, int, int], int] = {}
+
+    def amplify(self, index: int, phase: int, signal: int) -> Optional[int]:
+        key = (index, phase, signal)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
 
-        # We'll run each amplifier's intcode computer in its own thread,
-        # and use queues between the links for inter-thread communication.
-        amp_B = Amplifier('B', phase_order[1])
-        amp_C = Amplifier('C', phase_order[2])
-        amp_D = Amplifier('D', phase_order[3])
-        amp_E = Amplifier('E', phase_order[4])
+        program = self.programs[min(index, len(self.programs) - 1)]
+        computer = ENGINES[self.engine]([], None, None, None, lambda _: program.copy())
+        outputs = list(computer.stream([phase, signal]))
+        self.vm_runs += 1
 
-        amp_A.next = amp_B
+        output = outputs[-1] if outputs else None
+        self._cache[key] = output
+        return output
 
-        amp_B.next = amp_C
-        amp_C.next = amp_D
-        amp_D.next = amp_E
-        # Adds a feedback loop to the linked list
-        amp_E.next = amp_A
+    def best_phase_order(self, phases: Iterable[int], num_amplifiers: Optional[int] = None
+                         ) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """
+        The highest thruster signal and the phase order giving it, or None
+        if no order gets a signal all the way through. An amplifier that
+        outputs nothing ends every order going through it.
+        """
+        phases = list(phases)
+        if num_amplifiers is None:
+            num_amplifiers = len(phases)
+        return self._search(0, 0, phases, (), num_amplifiers)
+
+    def _search(self, index: int, signal: int, remaining: List[int],
+                prefix: Tuple[int, ...], num_amplifiers: int
+                ) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        if index == num_amplifiers:
+            return signal, prefix
+
+        best = None
+        for i, phase in enumerate(remaining):
+            output = self.amplify(index, phase, signal)
+            if output is None:
+                continue  # nothing for the next amplifier to read
+            result = self._search(index + 1, output, remaining[:i] + remaining[i + 1:],
+                                  prefix + (phase,), num_amplifiers)
+            if result is not None and (best is None or result > best):
+                best = result
+        return best
+
+
+# Program for the circuits run in each worker process, set once by _init_worker
+_worker_program: Optional[PagedMemory] = None
+
+
+def _init_worker(program: List[int]) -> None:
+    global _worker_program
+    _worker_program = PagedMemory(program, page_bits=6)
+
+
+def _evaluate_chunk(phase_orders: List[Tuple[int, ...]], feedback: bool, engine: str,
+                    budget: Optional[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+    results = []
+    for phase_order in phase_orders:
+        circuit = build_circuit(_worker_program, phase_order, feedback, engine, budget)
+        try:
+            signal = circuit.compute_output_signal()
+        except ResourceLimitExceeded:
+            continue  # a runaway circuit, drop it
+        if signal is not None:
+            results.append((signal, phase_order))
+    return results
+
+
+def search_phase_orders(program: List[int], phases: Iterable[int],
+                        num_amplifiers: Optional[int] = None, feedback: bool = True,
+                        engine: str = 'interpreter', workers: Optional[int] = None,
+                        chunk_size: int = 64, budget: Optional[int] = None
+                        ) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+    """
+    Evaluate the circuit for every ordering of num_amplifiers (by default
+    all) of the phase settings across a process pool, yielding
+    (thruster_signal, phase_order) pairs as chunks finish. The program is
+    sent to each worker once, and only a few chunks per worker are queued
+    at a time so huge permutation counts never sit in memory at once.
+    Circuits where any amplifier runs more than budget instructions, or
+    that never output a signal, are dropped.
+    """
+    phase_orders = itertools.permutations(list(phases), num_amplifiers)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 4 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(program,)) as executor:
+        in_flight = set()
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = list(itertools.islice(phase_orders, chunk_size))
+                if not chunk:
+                    break
+                in_flight.add(executor.submit(_evaluate_chunk, chunk, feedback, engine,
+                                               budget))
+            if not in_flight:
+                return
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
 
-        thruster_signal = amp.compute_output_signal()
 
-        if thruster_signal > max_thruster_signal:
-            max_thruster_signal = thruster_signal
-            best_phase_order = phase_order
-        
-    print(max_thruster_signal)
-    print(best_phase_order)
+if __name__=="__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='interpreter')
+    parser.add_argument('--budget', type=int,
+                        help='drop circuits where an amplifier runs more instructions than this')
+    args = parser.parse_args()
 
+    # Parsed and decoded once, then loaded from the on-disk cache
+    opcodes = load_program('input.txt')
 
+    # test cases
+    #opcodes = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    #opcodes = [3,52,1001,52,-5,52,3,53,1,52,56,54,1007,54,5,55,1005,55,26,1001,54,-5,54,1105,1,12,1,53,54,53,1008,54,0,55,1001,55,1,55,2,53,55,53,4,53,1001,56,-1,56,1005,56,6,99,0,0,0,0,10]
 
+    # part 1
+    # phases, feedback = [0,1,2,3,4], False
+    # part 2
+    phases, feedback = [9,8,7,6,5], True
+
+    if feedback:
+        # Each circuit is independent, so they are spread across every core.
+        best = max(search_phase_orders(opcodes, phases, feedback=feedback, engine=args.engine,
+                                       budget=args.budget), default=None)
+    else:
+        # Chains without feedback share work between orders with a common prefix.
+        best = ChainEvaluator(opcodes, args.engine).best_phase_order(phases)
+
+    if best is None:
+        if args.budget is not None:
+            print('no phase order fit in the budget of {} instructions'.format(args.budget))
+        else:
+            print('no phase order produced a thruster signal')
+    else:
+        max_thruster_signal, best_phase_order = best
+        print(max_thruster_signal)
+        print(best_phase_order)
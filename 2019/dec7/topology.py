@@ -0,0 +1,94 @@
+import os
+import sys
+
+from typing import Dict, List, Optional, Sequence
+
+# The shared Intcode VM lives in 2019/intcode
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import Broadcast, Channel, ENGINES, PagedMemory, RingBuffer, run_round_robin
+
+
+class Topology():
+    """
+    A network of Intcode VMs all running the same program. Each node has
+    one bounded input channel which every incoming edge writes into
+    (fan-in), and each output is copied to every outgoing edge (fan-out).
+    Edges may point anywhere, including back upstream for feedback. The
+    outputs of nodes without outgoing edges are collected, unbounded, and
+    returned by run().
+    """
+    def __init__(self, program: List[int], capacity: int = 16, engine: str = 'interpreter'):
+        self.program = PagedMemory(program, page_bits=6)
+        self.capacity = capacity
+        self.engine = engine
+        self.phases: Dict[str, Optional[int]] = {}
+        self.edges: Dict[str, List[str]] = {}
+        self.inputs: Dict[str, RingBuffer] = {}
+
+    def __repr__(self) -> str:
+        return 'Topology({})'.format(self.edges)
+
+    def add_node(self, name: str, phase_signal: Optional[int] = None) -> None:
+        self.phases[name] = phase_signal
+        self.edges[name] = []
+        self.inputs[name] = RingBuffer(self.capacity)
+
+    def connect(self, source: str, destination: str) -> None:
+        self.edges[source].append(destination)
+
+    def feed(self, name: str, value: int) -> None:
+        """Queue up an input for a node before the network runs."""
+        self.inputs[name].put(value)
+
+    def pending(self, name: str) -> List[int]:
+        """Drain the values left unread in a node's input channel."""
+        return self.inputs[name].drain()
+
+    def run(self) -> Dict[str, List[int]]:
+        sinks: Dict[str, Channel] = {}
+        computers = []
+        for name, phase_signal in self.phases.items():
+            destinations = self.edges[name]
+            if not destinations:
+                outputs = sinks[name] = Channel()
+            elif len(destinations) == 1:
+                outputs = self.inputs[destinations[0]]
+            else:
+                outputs = Broadcast([self.inputs[d] for d in destinations])
+            initial_inputs = [phase_signal] if phase_signal is not None else []
+            computers.append(ENGINES[self.engine]([], self.inputs[name], outputs, initial_inputs,
+                                                  lambda _: self.program.copy()))
+
+        run_round_robin(computers)
+
+        return {name: sink.drain() for name, sink in sinks.items()}
+
+    @classmethod
+    def chain(cls, program: List[int], phases: Sequence[int], **kwargs) -> 'Topology':
+        """Nodes '0'..'N-1' in a line, with node '0' fed a 0 signal."""
+        topology = cls(program, **kwargs)
+        for i, phase in enumerate(phases):
+            topology.add_node(str(i), phase)
+            if i > 0:
+                topology.connect(str(i - 1), str(i))
+        topology.feed('0', 0)
+        return topology
+
+    @classmethod
+    def ring(cls, program: List[int], phases: Sequence[int], **kwargs) -> 'Topology':
+        """A chain whose last node feeds back into node '0'."""
+        topology = cls.chain(program, phases, **kwargs)
+        topology.connect(str(len(phases) - 1), '0')
+        return topology
+
+    @classmethod
+    def fan_out(cls, program: List[int], source_phase: int, phases: Sequence[int],
+                **kwargs) -> 'Topology':
+        """Node 'source' feeding nodes '0'..'N-1' alongside each other."""
+        topology = cls(program, **kwargs)
+        topology.add_node('source', source_phase)
+        topology.feed('source', 0)
+        for i, phase in enumerate(phases):
+            topology.add_node(str(i), phase)
+            topology.connect('source', str(i))
+        return topology
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+
+# The shared Intcode VM lives in 2019/intcode
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import BACKENDS, ENGINES, Checkpointer, Profiler, load_program, restore
+from intcode.benchmark import instructions_per_second
+
+
+if __name__=="__main__":
+    # Parsed and decoded once, then loaded from the on-disk cache
+    opcodes = load_program('input.txt')
+
+    # test cases
+    # opcodes =[109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    # opcodes = [1102,34915192,34915192,7,4,7,99,0]
+    #opcodes = [104,1125899906842624,99]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='interpreter')
+    parser.add_argument('--memory', choices=BACKENDS.keys(), default='sparse')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='report instructions/sec for every engine')
+    parser.add_argument('--profile', metavar='JSON',
+                        help='print a profile of the run and write it as JSON to this file')
+    parser.add_argument('--checkpoint', metavar='LOG',
+                        help='checkpoint the run to this file, and resume from it if it exists')
+    parser.add_argument('--every', type=int, default=10000000,
+                        help='instructions between checkpoints')
+    args = parser.parse_args()
+
+    # part 1
+    # initial_inputs = [1]
+    # part 2
+    initial_inputs = [2]
+
+    if args.benchmark:
+        results = instructions_per_second(opcodes, ENGINES, initial_inputs,
+                                          memory=BACKENDS[args.memory])
+        for name, ips in results.items():
+            print('{}: {:.0f} instructions/sec'.format(name, ips))
+        sys.exit(0)
+
+    profiler = Profiler() if args.profile else None
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        computer = restore(args.checkpoint, ENGINES[args.engine], profiler=profiler)
+    else:
+        computer = ENGINES[args.engine](opcodes, None, None, initial_inputs, BACKENDS[args.memory],
+                                        profiler=profiler)
+
+    if args.checkpoint:
+        # Saves on SIGUSR1, and saves and stops on SIGTERM or Ctrl-C
+        if Checkpointer(args.checkpoint, args.every).run(computer):
+            print('stopped, run again to resume from {}'.format(args.checkpoint))
+    else:
+        computer.process()
+    for output in computer.drain():
+        print(output)
+
+    if profiler is not None:
+        print(profiler.report())
+        with open(args.profile, 'w') as f:
+            f.write(profiler.to_json())
@@ -0,0 +1,23 @@
+"""
+Intcode VM shared by every 2019 day that runs Intcode programs.
+
+Drivers put the 2019 directory on sys.path and import from here.
+"""
+from .blocks import BlockComputer
+from .channels import (Broadcast, Channel, ChannelFull, ConsoleInput, ConsoleOutput,
+                       InputNotReady, RingBuffer)
+from .checkpoint import Checkpointer, restore
+from .computer import (HALTED, HAS_OUTPUT, NEEDS_INPUT, OUTPUT_FULL, PAUSED, BudgetExceeded,
+                       Computer, DeadlineExceeded, Deadlock, OpcodeNotFound,
+                       ResourceLimitExceeded, decode, run_round_robin)
+from .loader import load_program
+from .memory import (ArrayMemory, BACKENDS, BoundedMemory, Memory, PagedMemory,
+                     PerCellArrayMemory)
+from .profiler import Profiler
+
+
+ENGINES = {
+    'interpreter': Computer,
+    'compiled': BlockComputer,
+}
+
@@ -1,17 +1,26 @@
-import itertools
-import sys
+"""
+The Intcode VMs the days ran before they shared one, kept as the bar
+every engine in the benchmark suite must clear. Each takes the same
+(opcodes, inputs, outputs, initial_inputs, memory) arguments as an
+engine and counts the instructions it runs, but is otherwise as it
+was. memory is ignored, since each runs on the memory it always had.
+"""
 from queue import Queue
 
 from typing import List, Optional
 
-
-class OpcodeNotFound(Exception):
-    pass
+from .computer import OpcodeNotFound
 
 
 OPCODE_BYTE_LEN = 2
 
 
+opcode_dict = {
+    1: 'ADD',
+    2: 'MULTIPLY',
+    99: 'STOP',
+}
+
 opcode_parameter_mode = {
     1: {'operation': 'ADD', 'nargs': 3},
     2: {'operation': 'MULTIPLY', 'nargs': 3},
@@ -28,34 +37,84 @@ opcode_no_parameter_mode = {
     99: {'operation': 'STOP', 'nargs': 0},
 }
 
-param_mode_dict = {
-    0: 'POSITION',
-    1: 'IMMEDIATE',
-    2: 'RELATIVE',
-}
 
+class Dec2Computer():
+    """
+    The day 2 VM: ADD, MULTIPLY and STOP in position mode only. Runs on a
+    copy of the program, as the day 2 driver did; the channels are ignored.
+    """
+    def __init__(self, opcodes: List[int], inputs=None, outputs=None, initial_inputs=None,
+                 memory=None):
+        self.opcodes = list(opcodes)
+        self.instruction_pointer = 0
+        self.keep_running = True
+        self.instruction_count = 0
 
-MEM_SIZE = 100000
+    def process(self) -> None:
+        while self.keep_running:
+            self._process_opcode(self.instruction_pointer)
+            self.instruction_pointer += 4
+            self.instruction_count += 1
 
-class Computer():
-    def __init__(self, opcodes: List[int], inputs: Queue, outputs: Queue,
-                 phase_signal: int):
-        # Make memory very large (opcodes == memory)
-        self.opcodes = opcodes + [0] * (MEM_SIZE - len(opcodes))
+    def _arithmetic_opcode(self, index: int, operation: str) -> None:
+        position_1 = self.opcodes[index + 1]
+        position_2 = self.opcodes[index + 2]
+        position_3 = self.opcodes[index + 3]
+
+        if operation == 'ADD':
+            result = self.opcodes[position_1] + self.opcodes[position_2]
+        elif operation == 'MULTIPLY':
+            result = self.opcodes[position_1] * self.opcodes[position_2]
+
+        self.opcodes[position_3] = result
+
+    def _process_opcode(self, index: int) -> None:
+        opcode = self.opcodes[index]
+        try:
+            operation = opcode_dict[opcode]
+            if operation == 'ADD' or operation == 'MULTIPLY':
+                self._arithmetic_opcode(index, operation)
+            elif operation == 'STOP':
+                self.keep_running = False
+        except KeyError:
+            raise OpcodeNotFound
+
+
+class Dec5Computer():
+    """
+    The day 5 VM, which decodes every instruction through the string form
+    of its opcode. It has no relative mode. Its inputs come from
+    initial_inputs and its outputs go to a list, rather than the console,
+    which would swamp the timing. It used to change the program it was
+    given in place, so it runs on a copy to be able to run again.
+    """
+    param_mode_dict = {
+        0: 'POSITION',
+        1: 'IMMEDIATE',
+    }
+    # Only day 9 has relative mode, see Dec9Computer
+    relative_base = 0
+
+    def __init__(self, opcodes: List[int], inputs=None, outputs=None, initial_inputs=None,
+                 memory=None):
+        self.opcodes = self._make_memory(opcodes)
         self.instruction_pointer = 0
-        self.relative_base = 0
         self.keep_running = True
-        self.inputs: Queue = inputs
-        self.outputs: Queue = outputs
-        self.phase_signal: Optional[int] = phase_signal
+        self.instruction_count = 0
+        self._console_inputs = iter(initial_inputs or ())
+        self.console_outputs: List[int] = []
+
+    def _make_memory(self, opcodes: List[int]) -> List[int]:
+        return list(opcodes)
 
-    def process(self) -> Optional[List]:
+    def process(self) -> None:
         while self.keep_running:
             self._process_instruction(self.instruction_pointer)
+            self.instruction_count += 1
 
-    def _process_instruction(self, index: int) -> Optional[List]:
+    def _process_instruction(self, index: int) -> None:
         opcode = self.opcodes[index]
-    
+
         try:
             op_lookup = opcode_no_parameter_mode[opcode]
         except KeyError:
@@ -75,7 +134,7 @@ class Computer():
         # Process parameter mode instructions
         modes = []
         for arg in reversed(range(op_lookup['nargs'])):
-            mode = param_mode_dict[int(opcode_str[arg])]
+            mode = self.param_mode_dict[int(opcode_str[arg])]
             modes.append(mode)
 
         if operation == 'ADD' or operation == 'MULTIPLY':
@@ -102,15 +161,10 @@ class Computer():
             self.instruction_pointer += 2
 
     def _relative_base_offset(self, index: int, modes: List[str]) -> None:
-         value_1 = self._read(index + 1, modes[0])
-         self.relative_base += value_1
+        # Not an instruction until day 9
+        raise OpcodeNotFound
 
     def _less_than_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is less than the second parameter, it
-        stores 1 in the position given by the third parameter. Otherwise,
-        it stores 0.
-        """
         value_1 = self._read(index + 1, modes[0])
         value_2 = self._read(index + 2, modes[1])
 
@@ -122,11 +176,6 @@ class Computer():
         self._write(index + 3, modes[2], result)
 
     def _equals_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is equal to the second parameter, it
-        stores 1 in the position given by the third parameter. Otherwise,
-        it stores 0.
-        """
         value_1 = self._read(index + 1, modes[0])
         value_2 = self._read(index + 2, modes[1])
 
@@ -138,10 +187,6 @@ class Computer():
         self._write(index + 3, modes[2], result)
 
     def _jump_if_true_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is non-zero, it sets the instruction pointer
-        to the value from the second parameter. Otherwise, it does nothing.
-        """
         value_1 = self._read(index + 1, modes[0])
         value_2 = self._read(index + 2, modes[1])
         if value_1 != 0:
@@ -150,10 +195,6 @@ class Computer():
             self.instruction_pointer += 3
 
     def _jump_if_false_opcode(self, index: int, modes: List[str]) -> None:
-        """
-        if the first parameter is zero, it sets the instruction pointer
-        to the value from the second parameter. Otherwise, it does nothing.
-        """
         value_1 = self._read(index + 1, modes[0])
         value_2 = self._read(index + 2, modes[1])
         if value_1 == 0:
@@ -183,16 +224,12 @@ class Computer():
         return value
 
     def _input(self, index: int, modes: List[str]) -> None:
-        if self.phase_signal:
-            input_value = self.phase_signal
-            self.phase_signal = None
-        else:
-            input_value = self.inputs.get()
+        input_value = int(next(self._console_inputs))
         self._write(index + 1, modes[0], input_value)
 
     def _output(self, index: int, modes: List[str]) -> None:
         value = self._read(index + 1, modes[0])
-        self.outputs.put(value)
+        self.console_outputs.append(value)
 
     def _arithmetic_opcode(self, index: int, operation: str, modes: List[str]) -> None:
         value_1 = self._read(index + 1, modes[0])
@@ -206,25 +243,65 @@ class Computer():
         self._write(index + 3, modes[2], result)
 
 
-if __name__=="__main__":
-    with open('input.txt', 'r') as f:
-        opcodes = f.read().split(',')
+class Dec7Computer(Dec5Computer):
+    """
+    The day 7 VM: day 5's, talking to the other amplifiers through
+    Queues. The first of initial_inputs is the phase signal (read first
+    unless it is 0, a bug the original had) and the rest are queued up.
+    Runs on a copy of the program, as each amplifier did.
+    """
+    def __init__(self, opcodes: List[int], inputs: Optional[Queue] = None,
+                 outputs: Optional[Queue] = None, initial_inputs=None, memory=None):
+        super().__init__(opcodes)
+        initial_inputs = list(initial_inputs or ())
+        self.inputs: Queue = inputs if inputs is not None else Queue()
+        self.outputs: Queue = outputs if outputs is not None else Queue()
+        self.phase_signal: Optional[int] = initial_inputs[0] if initial_inputs else None
+        for value in initial_inputs[1:]:
+            self.inputs.put(value)
+
+    def _input(self, index: int, modes: List[str]) -> None:
+        if self.phase_signal:
+            input_value = self.phase_signal
+            self.phase_signal = None
+        else:
+            # get() would wait forever for another thread to put a value
+            input_value = self.inputs.get_nowait()
+        self._write(index + 1, modes[0], input_value)
+
+    def _output(self, index: int, modes: List[str]) -> None:
+        value = self._read(index + 1, modes[0])
+        self.outputs.put(value)
+
 
-    opcodes = [int(x) for x in opcodes]
+MEM_SIZE = 100000
 
-    # test cases
-    # opcodes =[109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
-    # opcodes = [1102,34915192,34915192,7,4,7,99,0]
-    #opcodes = [104,1125899906842624,99]
 
-    in_q = Queue()
-    out_q = Queue()
-    # part 1
-    # computer = Computer(opcodes, in_q, out_q, 1)
-    # part 2
-    computer = Computer(opcodes, in_q, out_q, 2)
-    computer.process()
-    while not out_q.empty():
-        print(out_q.get())
+class Dec9Computer(Dec7Computer):
+    """
+    The day 9 VM: day 7's, plus relative mode, with memory made very
+    large up front (MEM_SIZE cells) so that programs can address past
+    their end.
+    """
+    param_mode_dict = {
+        0: 'POSITION',
+        1: 'IMMEDIATE',
+        2: 'RELATIVE',
+    }
 
+    def _make_memory(self, opcodes: List[int]) -> List[int]:
+        # Make memory very large (opcodes == memory)
+        return opcodes + [0] * (MEM_SIZE - len(opcodes))
 
+    def _relative_base_offset(self, index: int, modes: List[str]) -> None:
+        value_1 = self._read(index + 1, modes[0])
+        self.relative_base += value_1
+
+
+# name -> VM, for the benchmark suite
+BASELINES = {
+    'dec2': Dec2Computer,
+    'dec5': Dec5Computer,
+    'dec7': Dec7Computer,
+    'dec9': Dec9Computer,
+}
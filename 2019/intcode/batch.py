@@ -0,0 +1,207 @@
+from collections import deque
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional, only BatchComputer needs it
+    np = None
+
+from .computer import IMMEDIATE, POSITION, STOP, OpcodeNotFound, decode
+
+
+# Any sum or product estimated at this size or more may not fit in int64.
+# Well below 2 ** 63, to leave room for float64 rounding in the estimate.
+INT64_SAFE = 2.0 ** 62
+
+
+class BatchComputer():
+    """
+    Runs the same Intcode program on many lanes at once, SIMD-style. The
+    lane memories are the rows of one 2D int64 NumPy array, and lanes at
+    the same instruction pointer form a group that executes each
+    instruction for all of its lanes in a handful of array operations.
+    Lanes may hold different values anywhere in memory, parameters
+    included (e.g. day 2's noun and verb).
+
+    When a jump goes different ways in a group, or its lanes disagree on
+    the opcode to run, the group splits by instruction pointer. Groups
+    that land on the same instruction pointer after a step merge again.
+
+    Memory is fixed at size cells per lane (the program length by
+    default). Sums and products are estimated in float64 first, and the
+    first time one might not fit in 64 bits the whole batch is promoted
+    (promoted is set) to an object array of Python ints, which is slower
+    but exact at any size. A lane that addresses memory
+    out of range or runs an unknown opcode stops with failed set rather
+    than stopping the whole batch. inputs, if given, holds the values
+    each lane's INPUTs read in order; running out of them fails the lane.
+    operations, if given, restricts the instruction set to those raw
+    opcodes, as for Computer.
+    """
+    def __init__(self, opcodes: List[int], lanes: int, size: Optional[int] = None,
+                 inputs: Optional[Sequence[Sequence[int]]] = None,
+                 operations: Optional[Iterable[int]] = None):
+        if np is None:
+            raise ImportError('BatchComputer needs numpy')
+        size = max(size or 0, len(opcodes))
+        program = np.zeros(size, dtype=np.int64)
+        try:
+            program[:len(opcodes)] = opcodes
+            self.promoted = False
+        except OverflowError:
+            program = program.astype(object)
+            program[:len(opcodes)] = opcodes
+            self.promoted = True
+
+        # memory[lane] == opcodes of that lane
+        self.memory = np.tile(program, (lanes, 1))
+        self.lanes = lanes
+        self.relative_base = np.zeros(lanes, dtype=program.dtype)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.failed = np.zeros(lanes, dtype=bool)
+        self.instruction_count = 0
+        self.inputs = [deque(values) for values in inputs] if inputs is not None else \
+            [deque() for _ in range(lanes)]
+        self.outputs: List[List[int]] = [[] for _ in range(lanes)]
+        self.operations = set(operations) if operations is not None else None
+
+    def __repr__(self) -> str:
+        return 'BatchComputer({} lanes, {} halted, {} failed)'.format(
+            self.lanes, int(self.halted.sum()), int(self.failed.sum()))
+
+    def _promote(self) -> None:
+        self.memory = self.memory.astype(object)
+        self.relative_base = self.relative_base.astype(object)
+        self.promoted = True
+
+    def _overflows(self, value_1: 'np.ndarray', value_2: 'np.ndarray', operation: int) -> bool:
+        if self.promoted:
+            return False
+        value_1 = value_1.astype(np.float64)
+        value_2 = value_2.astype(np.float64)
+        estimate = value_1 * value_2 if operation == 2 else value_1 + value_2
+        return bool((np.abs(estimate) >= INT64_SAFE).any())
+
+    def process(self) -> None:
+        # instruction pointer -> lanes there
+        groups: Dict[int, 'np.ndarray'] = {0: np.arange(self.lanes)}
+        while groups:
+            stepped: Dict[int, List['np.ndarray']] = {}
+            for pointer, lanes in groups.items():
+                for next_pointer, next_lanes in self._step(pointer, lanes):
+                    stepped.setdefault(next_pointer, []).append(next_lanes)
+            groups = {pointer: np.concatenate(parts) if len(parts) > 1 else parts[0]
+                      for pointer, parts in stepped.items()}
+
+    def _step(self, pointer: int, lanes: 'np.ndarray'):
+        """
+        Run the instruction at pointer for lanes. Yields (instruction
+        pointer, lanes) for every group of lanes that carries on.
+        """
+        size = self.memory.shape[1]
+        if pointer < 0 or pointer >= size:
+            self.failed[lanes] = True
+            return
+
+        raw = self.memory[lanes, pointer]
+        first = raw[0]
+        if not (raw == first).all():
+            # The lanes rewrote this instruction differently
+            for opcode in np.unique(raw):
+                yield from self._step_same(pointer, lanes[raw == opcode], int(opcode))
+            return
+        yield from self._step_same(pointer, lanes, int(first))
+
+    def _step_same(self, pointer: int, lanes: 'np.ndarray', opcode: int):
+        if self.operations is not None and opcode not in self.operations:
+            self.failed[lanes] = True
+            return
+        try:
+            operation, modes = decode(opcode)
+        except OpcodeNotFound:
+            self.failed[lanes] = True
+            return
+        if operation == STOP:
+            self.halted[lanes] = True
+            return
+
+        size = self.memory.shape[1]
+        if pointer + len(modes) >= size:
+            self.failed[lanes] = True
+            return
+        self.instruction_count += len(lanes)
+
+        # Address each parameter refers to, per lane
+        addresses = []
+        for arg, mode in enumerate(modes):
+            if mode == IMMEDIATE:
+                addresses.append(np.full(len(lanes), pointer + 1 + arg, dtype=np.int64))
+            elif mode == POSITION:
+                addresses.append(self.memory[lanes, pointer + 1 + arg])
+            else:
+                addresses.append(self.memory[lanes, pointer + 1 + arg]
+                                 + self.relative_base[lanes])
+
+        # Lanes reaching outside of memory fail, the rest carry on
+        valid = np.ones(len(lanes), dtype=bool)
+        for address in addresses:
+            valid &= (address >= 0) & (address < size)
+        if not valid.all():
+            self.failed[lanes[~valid]] = True
+            lanes = lanes[valid]
+            addresses = [address[valid] for address in addresses]
+            if not len(lanes):
+                return
+        if self.promoted:
+            addresses = [address.astype(np.int64) for address in addresses]
+
+        memory = self.memory
+        if operation in (1, 2, 7, 8):
+            value_1 = memory[lanes, addresses[0]]
+            value_2 = memory[lanes, addresses[1]]
+            if operation in (1, 2) and self._overflows(value_1, value_2, operation):
+                self._promote()
+                memory = self.memory
+                value_1 = value_1.astype(object)
+                value_2 = value_2.astype(object)
+            if operation == 1:
+                result = value_1 + value_2
+            elif operation == 2:
+                result = value_1 * value_2
+            elif operation == 7:
+                result = (value_1 < value_2).astype(np.int64)
+            else:
+                result = (value_1 == value_2).astype(np.int64)
+            memory[lanes, addresses[2]] = result
+            yield pointer + 4, lanes
+        elif operation in (5, 6):
+            condition = memory[lanes, addresses[0]] != 0
+            if operation == 6:
+                condition = ~condition
+            targets = np.where(condition, memory[lanes, addresses[1]], pointer + 3)
+            for target in np.unique(targets):
+                yield int(target), lanes[targets == target]
+        elif operation == 9:
+            offsets = memory[lanes, addresses[0]]
+            if self._overflows(self.relative_base[lanes], offsets, operation):
+                self._promote()
+                offsets = offsets.astype(object)
+            self.relative_base[lanes] += offsets
+            yield pointer + 2, lanes
+        elif operation == 3:
+            ready = np.array([bool(self.inputs[lane]) for lane in lanes], dtype=bool)
+            self.failed[lanes[~ready]] = True
+            lanes = lanes[ready]
+            if len(lanes):
+                values = [self.inputs[lane].popleft() for lane in lanes]
+                try:
+                    memory[lanes, addresses[0][ready]] = values
+                except OverflowError:
+                    self._promote()
+                    self.memory[lanes, addresses[0][ready]] = values
+                yield pointer + 2, lanes
+        else:  # OUTPUT
+            for lane, value in zip(lanes, memory[lanes, addresses[0]]):
+                self.outputs[lane].append(int(value))
+            yield pointer + 2, lanes
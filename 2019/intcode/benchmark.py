@@ -0,0 +1,301 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from queue import Empty
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .baselines import BASELINES
+from .computer import OpcodeNotFound
+from .memory import Memory
+
+
+def instructions_per_second(opcodes: List[int], engines: Dict[str, Callable],
+                            initial_inputs: Sequence[int] = (), repeat: int = 3,
+                            memory: Callable[[List[int]], Memory] = Memory) -> Dict[str, float]:
+    """
+    Run the program on every engine and return the best instructions per
+    second seen for each out of repeat runs.
+    """
+    results = {}
+    for name, engine in engines.items():
+        best = None
+        for _ in range(repeat):
+            computer = engine(opcodes, None, None, initial_inputs, memory)
+            start = time.perf_counter()
+            computer.process()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        results[name] = computer.instruction_count / best
+    return results
+
+
+def countdown(n: int) -> List[int]:
+    """Count a cell in memory down from n (two instructions a loop)."""
+    return [1101, 0, n, 100, 1001, 100, -1, 100, 1005, 100, 4, 4, 100, 99]
+
+
+def nested_loops(outer: int, inner: int) -> List[int]:
+    """An outer counter loop around an inner one, with compares and sums."""
+    return [1101, 0, outer, 100,              # 0: outer = n
+            1101, 0, inner, 101,              # 4: inner = m
+            1, 102, 101, 102,                 # 8: total += inner
+            1001, 101, -1, 101,               # 12: inner -= 1
+            1007, 101, 1, 103,                # 16: done = inner < 1
+            1006, 103, 8,                     # 20: if not done goto 8
+            1001, 100, -1, 100,               # 23: outer -= 1
+            1005, 100, 4,                     # 27: if outer goto 4
+            4, 102, 99]                       # 30: output total
+
+
+def arithmetic_chain(n: int) -> List[int]:
+    """
+    n position mode ADDs and MULTIPLYs over a data area after the code,
+    each reading the result of the one before, shaped like a day 2 input.
+    MULTIPLYs are by the last data cell, which holds 1, so values stay small.
+    """
+    data = 4 * n + 1
+    program = []
+    for i in range(n):
+        if i % 2:
+            program.extend((2, data + i % 7, data + 7, data + (i + 2) % 7))
+        else:
+            program.extend((1, data + i % 7, data + (i + 3) % 7, data + (i + 1) % 7))
+    program.append(99)
+    return program + [1, 2, 3, 1, 2, 1, 3, 1]
+
+
+def relative_sweep(n: int) -> List[int]:
+    """Write then add up n cells past the program through relative mode."""
+    return [109, 200,                         # 0: rb = 200
+            21101, 0, 1, 0,                   # 2: m[rb] = 1
+            109, 1,                           # 6: rb += 1
+            1001, 198, 1, 198,                # 8: count += 1
+            1007, 198, n, 199,                # 12: more = count < n
+            1005, 199, 2,                     # 16: if more goto 2
+            4, 198, 99]                       # 19: output count
+
+
+# name -> (program, inputs). The samples are the test cases in the dec2,
+# dec5 and dec9 drivers' comments. dec7's are feedback loops, which need
+# five VMs passing signals around, so none of them is here.
+PROGRAMS = {
+    'dec2 sample': ([1, 9, 10, 3, 2, 3, 11, 0, 99, 30, 40, 50], []),
+    # Outputs 999, 1000 or 1001 for an input below, equal to or above 8
+    'dec5 sample': ([3, 21, 1008, 21, 8, 20, 1005, 20, 22, 107, 8, 21, 20, 1006, 20, 31,
+                     1106, 0, 36, 98, 0, 0, 1002, 21, 125, 20, 4, 20, 1105, 1, 46, 104,
+                     999, 1105, 1, 46, 1101, 1000, 1, 20, 4, 20, 1105, 1, 46, 98, 99], [8]),
+    'dec9 quine': ([109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+                   []),
+    'dec9 large multiply': ([1102, 34915192, 34915192, 7, 4, 7, 99, 0], []),
+    'dec9 large output': ([104, 1125899906842624, 99], []),
+    'dec2-like chain 40': (arithmetic_chain(40), []),
+    'countdown 100k': (countdown(100000), []),
+    'nested loops 300x300': (nested_loops(300, 300), []),
+    'relative sweep 20k': (relative_sweep(20000), []),
+}
+
+
+def _run(engine: Callable, memory: Callable, program: List[int], inputs: List[int]):
+    # Each engine talks through whatever channels it makes by default
+    computer = engine(program, None, None, inputs, memory)
+    computer.process()
+    return computer
+
+
+def benchmark(engine: Callable, memory: Callable, program: List[int], inputs: List[int],
+              repeat: int = 3, min_time: float = 0.05) -> Dict:
+    """
+    Time one program on one engine and memory backend: best instructions
+    per second and construction time out of repeat samples (each looped
+    until it takes at least min_time), plus peak traced memory of one run.
+    """
+    best_run = None
+    best_construction = None
+    instructions = 0
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            computer = _run(engine, memory, program, inputs)
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        instructions = computer.instruction_count
+        if best_run is None or elapsed / loops < best_run:
+            best_run = elapsed / loops
+
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            engine(program, None, None, inputs, memory)
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / 10:
+                break
+        if best_construction is None or elapsed / loops < best_construction:
+            best_construction = elapsed / loops
+
+    tracemalloc.start()
+    try:
+        _run(engine, memory, program, inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'instructions': instructions,
+        'seconds': best_run,
+        'instructions_per_second': instructions / best_run if best_run else None,
+        'construction_seconds': best_construction,
+        'peak_bytes': peak,
+    }
+
+
+def run_baseline(programs: Dict = PROGRAMS, repeat: int = 3, min_time: float = 0.05) -> List[Dict]:
+    """
+    Benchmark every old VM in BASELINES on every program it can run,
+    recorded as engine 'baseline <day>'.
+    """
+    results = []
+    for program_name, (program, inputs) in programs.items():
+        for day, baseline in BASELINES.items():
+            try:
+                result = benchmark(baseline, list, program, inputs, repeat, min_time)
+            except (OpcodeNotFound, Empty, IndexError, KeyError):
+                continue  # needs instructions, modes or memory that day didn't have
+            result.update({'program': program_name, 'engine': 'baseline ' + day,
+                           'memory': 'list'})
+            results.append(result)
+    return results
+
+
+def _is_baseline(result: Dict) -> bool:
+    return result['engine'].startswith('baseline')
+
+
+def behind_baseline(suite: Dict) -> List[str]:
+    """
+    Lines describing every result that takes longer per run (construction
+    included) than the fastest baseline on the same program.
+    """
+    baselines: Dict[str, Dict] = {}
+    for result in suite['results']:
+        if _is_baseline(result) and 'error' not in result:
+            fastest = baselines.get(result['program'])
+            if fastest is None or result['seconds'] < fastest['seconds']:
+                baselines[result['program']] = result
+    slower = []
+    for result in suite['results']:
+        baseline = baselines.get(result['program'])
+        if baseline is None or _is_baseline(result) or 'error' in result:
+            continue
+        if result['seconds'] > baseline['seconds']:
+            slower.append('{} / {} / {}: {:.1f}us per run, {} {:.1f}us'.format(
+                *_key(result), result['seconds'] * 1e6, baseline['engine'],
+                baseline['seconds'] * 1e6))
+    return slower
+
+
+def _revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(engines: Dict[str, Callable], backends: Dict[str, Callable],
+              programs: Dict = PROGRAMS, repeat: int = 3, min_time: float = 0.05) -> Dict:
+    """
+    Benchmark every program on every engine and memory backend. A
+    combination that fails (e.g. the 'list' backend on a program that
+    addresses past its end) is recorded with its error.
+    """
+    results = []
+    for program_name, (program, inputs) in programs.items():
+        for engine_name, engine in engines.items():
+            for memory_name, memory in backends.items():
+                result = {'program': program_name, 'engine': engine_name,
+                          'memory': memory_name}
+                try:
+                    result.update(benchmark(engine, memory, program, inputs, repeat, min_time))
+                except Exception as e:
+                    result['error'] = '{}: {}'.format(type(e).__name__, e)
+                results.append(result)
+    return {'revision': _revision(), 'python': platform.python_version(), 'results': results}
+
+
+def _key(result: Dict) -> tuple:
+    return result['program'], result['engine'], result['memory']
+
+
+def compare(old: Dict, new: Dict, threshold: float = 0.1) -> List[str]:
+    """
+    Lines describing every result whose instructions/sec dropped by more
+    than threshold (a fraction) from old to new.
+    """
+    previous = {_key(result): result for result in old['results']
+                if result.get('instructions_per_second')}
+    regressions = []
+    for result in new['results']:
+        before = previous.get(_key(result))
+        after = result.get('instructions_per_second')
+        if before is None or not after:
+            continue
+        ratio = after / before['instructions_per_second']
+        if ratio < 1 - threshold:
+            regressions.append('{} / {} / {}: {:.0f} -> {:.0f} instructions/sec ({:+.0%})'.format(
+                *_key(result), before['instructions_per_second'], after, ratio - 1))
+    return regressions
+
+
+def report(suite: Dict) -> str:
+    lines = ['{:<22} {:<13} {:<10} {:>14} {:>13} {:>11}'.format(
+        'program', 'engine', 'memory', 'instr/sec', 'construct us', 'peak KiB')]
+    for result in suite['results']:
+        if 'error' in result:
+            lines.append('{:<22} {:<13} {:<10} {}'.format(*_key(result), result['error']))
+            continue
+        lines.append('{:<22} {:<13} {:<10} {:>14.0f} {:>13.1f} {:>11.1f}'.format(
+            *_key(result), result['instructions_per_second'],
+            result['construction_seconds'] * 1e6, result['peak_bytes'] / 1024))
+    return '\n'.join(lines)
+
+
+if __name__=="__main__":
+    # Run from the 2019 directory: python -m intcode.benchmark
+    from . import BACKENDS, ENGINES
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--json', metavar='PATH', help='save the results to this file')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='report regressions against results saved earlier')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown (a fraction) that counts as a regression')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engine', choices=ENGINES.keys(), action='append')
+    parser.add_argument('--memory', choices=BACKENDS.keys(), action='append')
+    args = parser.parse_args()
+
+    engines = {name: ENGINES[name] for name in args.engine or ENGINES}
+    backends = {name: BACKENDS[name] for name in args.memory or BACKENDS}
+    suite = run_suite(engines, backends, repeat=args.repeat)
+    suite['results'].extend(run_baseline(repeat=args.repeat))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(suite, f, indent=2)
+    print(report(suite))
+    print()
+    slower = behind_baseline(suite)
+    print('\n'.join(slower) if slower else 'nothing behind the baseline')
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(json.load(f), suite, args.threshold)
+        print()
+        print('\n'.join(regressions) if regressions else 'no regressions')
@@ -0,0 +1,366 @@
+from collections import Counter
+from types import TracebackType
+from typing import Callable, Container, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .computer import Computer, IMMEDIATE, OpcodeNotFound, POSITION, RELATIVE, decode
+from .memory import Memory, dense_region
+
+
+# Longest straight-line run we will fuse into a single block
+MAX_BLOCK_LEN = 64
+
+# Operations that can live inside a block. JUMP_IF_* end a block, while
+# INPUT, OUTPUT and STOP are always left to the interpreter.
+STRAIGHT_LINE = {1: '+', 2: '*', 7: '<', 8: '=='}
+JUMPS = {5: '!=', 6: '=='}
+RELATIVE_BASE_OFFSET = 9
+
+# Generated block functions are shared by every VM running the same code,
+# so each distinct block is only ever passed to compile() once.
+_function_cache: Dict[str, Callable] = {}
+
+# A compiled block: its function, end address, number of instructions,
+# and for each line of its source the (address, instructions run before
+# it) of the instruction that line belongs to
+Translation = Tuple[Callable, int, int, List[Tuple[int, int]]]
+
+# (start address, instruction set) -> translations made there, each with
+# the memory cells it was made from (None for an interpreted start). Any
+# VM whose memory holds the same cells there reuses it, so every VM
+# running a program shares one translation of each of its blocks.
+_translation_cache: Dict[Tuple[int, Optional[FrozenSet[int]]],
+                         List[Tuple[List[int], Optional[Translation]]]] = {}
+
+# Different code seen at one start address (self-modifying programs) before
+# the oldest translation there is forgotten
+MAX_TRANSLATIONS_PER_START = 8
+
+
+def _read_expr(value: int, mode: int) -> str:
+    if mode == POSITION:
+        return 'm[{}]'.format(value)
+    elif mode == IMMEDIATE:
+        return str(value)
+    return 'm[rb + {}]'.format(value)
+
+
+def _jump_target_expr(value: int, mode: int) -> str:
+    if mode == IMMEDIATE:
+        return str(value)
+    return _read_expr(value, mode)
+
+
+def _translate(opcodes: Memory, start: int, operations: Optional[Container[int]],
+               limit: Optional[int]
+               ) -> Optional[Tuple[List[str], int, List[Tuple[int, int]], int,
+                               List[Tuple[int, int]]]]:
+    lines = ['def block(m, rb, code, written):']
+    positions = [(start, 0)]
+    # (address, address of the next instruction) for every constant write
+    constant_writes = []
+    index = start
+    read_end = start
+    count = 0
+    while count < MAX_BLOCK_LEN and (limit is None or index < limit):
+        opcode = opcodes[index]
+        read_end = index + 1
+        if operations is not None and opcode not in operations:
+            break
+        try:
+            operation, modes = decode(opcode)
+        except OpcodeNotFound:
+            break
+        params = [opcodes[index + 1 + arg] for arg in range(len(modes))]
+        read_end += len(modes)
+        position = (index, count)
+        first_line = len(lines)
+
+        if operation in STRAIGHT_LINE:
+            value_1 = _read_expr(params[0], modes[0])
+            value_2 = _read_expr(params[1], modes[1])
+            expr = '{} {} {}'.format(value_1, STRAIGHT_LINE[operation], value_2)
+            if operation in (7, 8):
+                expr = '1 if {} else 0'.format(expr)
+
+            count += 1
+            if modes[2] == RELATIVE:
+                lines.append('    a = rb + {}'.format(params[2]))
+                lines.append('    m[a] = {}'.format(expr))
+                lines.append('    if a in code:')
+                lines.append('        written.append(a)')
+                # Writing ahead into this very block ends it early so that
+                # the stale code is never run.
+                lines.append('        if {0} <= a < END: return {0}, rb, {1}'.format(
+                    index + 4, count))
+            else:
+                address = params[2] if modes[2] == POSITION else index + 3
+                constant_writes.append((address, index + 4))
+                lines.append('    m[{}] = {}'.format(address, expr))
+                lines.append('    if {0} in code: written.append({0})'.format(address))
+            index += 4
+        elif operation == RELATIVE_BASE_OFFSET:
+            lines.append('    rb += {}'.format(_read_expr(params[0], modes[0])))
+            count += 1
+            index += 2
+        elif operation in JUMPS:
+            count += 1
+            index += 3
+            lines.append('    if {} {} 0: return {}, rb, {}'.format(
+                _read_expr(params[0], modes[0]), JUMPS[operation],
+                _jump_target_expr(params[1], modes[1]), count))
+            positions.append(position)
+            break
+        else:  # INPUT, OUTPUT, STOP
+            break
+        positions.extend([position] * (len(lines) - first_line))
+
+    if count == 0:
+        return None
+
+    lines.append('    return {}, rb, {}'.format(index, count))
+    positions.append((index, count))
+    return lines, index, constant_writes, read_end, positions
+
+
+def translate(opcodes: Memory, start: int, operations: Optional[Container[int]] = None
+              ) -> Optional[Tuple[str, int, int, List[Tuple[int, int]]]]:
+    """
+    Translate the basic block starting at start into the source of a
+    Python function block(m, rb, code, written). The function returns
+    the tuple (next instruction pointer, relative base, instructions
+    executed), and appends every address it wrote inside compiled code
+    to written.
+
+    Returns None if the first instruction has to be interpreted, otherwise
+    the source, the (exclusive) end address of the block, the end of the
+    cells the translation depends on, and for each line of the source the
+    (address, instructions run before it) of the instruction it belongs
+    to. The block stops at any raw opcode outside of operations (if
+    given, as for Computer), and just after any constant address write
+    that lands further on in the block itself.
+    """
+    limit = None
+    read_end = start
+    while True:
+        translation = _translate(opcodes, start, operations, limit)
+        if translation is None:
+            return None
+
+        lines, end, constant_writes, cells_read, positions = translation
+        # Where the block was cut short depends on the cells past the cut
+        read_end = max(read_end, cells_read)
+        overwritten = [next_index for address, next_index in constant_writes
+                       if next_index <= address < end]
+        if not overwritten:
+            break
+        limit = min(overwritten)
+
+    source = '\n'.join(lines).replace('END', str(end))
+    return source, end, read_end, positions
+
+
+def compile_block(source: str) -> Callable:
+    try:
+        return _function_cache[source]
+    except KeyError:
+        namespace: Dict = {}
+        exec(compile(source, '<intcode block>', 'exec'), namespace)
+        function = _function_cache[source] = namespace['block']
+        return function
+
+
+class BlockComputer(Computer):
+    """
+    Engine that translates basic blocks (straight-line ADD, MULTIPLY,
+    LESS_THAN, EQUALS and RELATIVE_BASE_OFFSET runs, ended by a jump) into
+    generated Python functions, then runs a whole block per call. Blocks
+    are looked up by the address they start at. INPUT, OUTPUT and STOP
+    are always handled by the dispatch interpreter. A write into compiled
+    code invalidates every block covering that address, and a block that
+    writes ahead into itself stops right after the write.
+
+    With a profiler, every instruction is interpreted so that it can be
+    counted. Near an instruction budget or pause_at, instructions are
+    interpreted one at a time rather than running a block that could go
+    past the limit, so both engines stop at the same instruction. A block
+    that raises part-way leaves the VM at the instruction that raised,
+    with everything before it done, as the interpreter would.
+
+    Translations are shared between VMs, see _translation_cache, so a
+    new VM running a program another has run before compiles nothing.
+    """
+    def __init__(self, opcodes: List[int], inputs=None, outputs=None,
+                 initial_inputs: Optional[Iterable[int]] = None,
+                 memory: Callable[[List[int]], Memory] = Memory,
+                 operations: Optional[Iterable[int]] = None,
+                 profiler=None):
+        super().__init__(opcodes, inputs, outputs, initial_inputs, memory, operations, profiler)
+        self._instruction_set = frozenset(operations) if operations is not None else None
+        self._blocks: Dict[int, Optional[Callable]] = {}
+        self._block_ends: Dict[int, int] = {}
+        # Start address -> number of instructions in the block
+        self._block_sizes: Dict[int, int] = {}
+        # Start address -> (address, instructions run before it) by line
+        self._block_positions: Dict[int, List[Tuple[int, int]]] = {}
+        # Address -> number of compiled blocks covering it. Counted in one
+        # go per block, since every new VM covers its program again.
+        self._code: Counter = Counter()
+        self._written: List[int] = []
+
+    def process(self) -> None:
+        blocks = self._blocks
+        code = self._code
+        handlers = self._handlers
+        opcodes = self.opcodes
+        written = self._written
+        block_sizes = self._block_sizes
+        decoded = self._decoded
+        check_at = self._next_check()
+        while self.keep_running and not self.waiting:
+            if self.instruction_count >= check_at:
+                if self._check_limits():
+                    break
+                check_at = self._next_check()
+            index = self.instruction_pointer
+            block = blocks.get(index, False)
+            if block is False:
+                block = self._compile(index)
+
+            if block is None or self.instruction_count + block_sizes[index] > check_at:
+                try:
+                    operation, modes = decoded[opcodes[index]]
+                except KeyError:
+                    operation, modes = self._decode(opcodes[index])
+                handlers[operation](self, index, modes)
+                self.instruction_count += 1
+                continue
+
+            try:
+                self.instruction_pointer, self.relative_base, executed = block(
+                    opcodes, self.relative_base, code, written)
+            except Exception as e:
+                self._stopped_in_block(index, e.__traceback__)
+                raise
+            finally:
+                if written:
+                    for address in written:
+                        self._invalidate(address)
+                    written.clear()
+            self.instruction_count += executed
+
+    def _stopped_in_block(self, start: int, traceback: Optional[TracebackType]) -> None:
+        # The block at start raised. Find the line it raised on, and leave
+        # the VM at the instruction that line belongs to.
+        code = self._blocks[start].__code__
+        while traceback is not None and traceback.tb_frame.f_code is not code:
+            traceback = traceback.tb_next
+        if traceback is None:
+            return
+        self.instruction_pointer, executed = self._block_positions[start][traceback.tb_lineno - 1]
+        self.relative_base = traceback.tb_frame.f_locals['rb']
+        self.instruction_count += executed
+
+    def reload(self, opcodes: List[int]) -> None:
+        super().reload(opcodes)
+        # Blocks have the old program's constants built in
+        self._blocks.clear()
+        self._block_ends.clear()
+        self._block_sizes.clear()
+        self._block_positions.clear()
+        self._code.clear()
+        self._written.clear()
+
+    def _compile(self, start: int) -> Optional[Callable]:
+        if self.profiler is not None:
+            self._blocks[start] = None
+            return None
+
+        translation = self._translation(start)
+        if translation is None:
+            self._blocks[start] = None
+            return None
+
+        block, end, size, positions = translation
+        self._blocks[start] = block
+        self._block_ends[start] = end
+        self._block_sizes[start] = size
+        self._block_positions[start] = positions
+        self._code.update(range(start, end))
+        return block
+
+    def _translation(self, start: int) -> Optional[Translation]:
+        # The shared translation of the code at start, made if need be
+        translations = _translation_cache.setdefault((start, self._instruction_set), [])
+        for cells, translation in translations:
+            if self._cells(start, start + len(cells)) == cells:
+                return translation
+
+        result = translate(self.opcodes, start, self.operations)
+        if result is None:
+            # Only the opcode decides that it is interpreted
+            cells, translation = self._cells(start, start + 1), None
+        else:
+            source, end, read_end, positions = result
+            size = 0
+            address = start
+            while address < end:
+                address += 1 + len(decode(self.opcodes[address])[1])
+                size += 1
+            cells = self._cells(start, read_end)
+            translation = (compile_block(source), end, size, positions)
+        if cells is not None:
+            if len(translations) == MAX_TRANSLATIONS_PER_START:
+                del translations[0]
+            translations.append((cells, translation))
+        return translation
+
+    def _cells(self, start: int, end: int) -> Optional[List[int]]:
+        # The values in memory from start up to end, or None if some of
+        # them are out of its range
+        if start < 0:
+            return None
+        dense = dense_region(self.opcodes)
+        if dense is not None and end <= len(dense):
+            return dense[start:end]
+        try:
+            return [self.opcodes[address] for address in range(start, end)]
+        except IndexError:
+            return None
+
+    def _add(self, index: int, modes: Tuple[int, ...]) -> None:
+        # Through _write, as an interpreted write may land in compiled code
+        result = self._read(index + 1, modes[0]) + self._read(index + 2, modes[1])
+        self._write(index + 3, modes[2], result)
+        self.instruction_pointer = index + 4
+
+    def _multiply(self, index: int, modes: Tuple[int, ...]) -> None:
+        result = self._read(index + 1, modes[0]) * self._read(index + 2, modes[1])
+        self._write(index + 3, modes[2], result)
+        self.instruction_pointer = index + 4
+
+    def _write(self, index: int, mode: int, value: int) -> int:
+        position = super()._write(index, mode, value)
+        if position in self._code or position in self._blocks:
+            self._invalidate(position)
+        return position
+
+    def _invalidate(self, position: int) -> None:
+        # An interpreted start address may now begin a compilable block
+        if self._blocks.get(position, False) is None:
+            del self._blocks[position]
+
+        if position not in self._code:
+            return
+        code = self._code
+        for start, end in list(self._block_ends.items()):
+            if not start <= position < end:
+                continue
+            del self._blocks[start]
+            del self._block_ends[start]
+            del self._block_sizes[start]
+            del self._block_positions[start]
+            for address in range(start, end):
+                if code[address] == 1:
+                    del code[address]
+                else:
+                    code[address] -= 1
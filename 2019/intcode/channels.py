@@ -0,0 +1,118 @@
+from collections import deque
+
+from typing import Iterable, Iterator, List
+
+
+class InputNotReady(Exception):
+    pass
+
+
+class ChannelFull(Exception):
+    pass
+
+
+class Channel(deque):
+    """
+    Single-threaded replacement for a Queue between VMs. Reading from an
+    empty Channel raises InputNotReady rather than blocking, which makes
+    the reading VM pause until a scheduler resumes it. It is a deque of
+    the values waiting to be read, so that making and writing to one cost
+    no more than they do for a deque.
+    """
+    put = deque.append
+
+    def __repr__(self) -> str:
+        return 'Channel({})'.format(list(self))
+
+    def get(self) -> int:
+        try:
+            return self.popleft()
+        except IndexError:
+            raise InputNotReady
+
+    def drain(self) -> List[int]:
+        """Take every value in the channel at once."""
+        values = list(self)
+        self.clear()
+        return values
+
+    def empty(self) -> bool:
+        return not self
+
+
+class RingBuffer():
+    """
+    Bounded channel between two VMs. A full buffer raises ChannelFull,
+    which pauses the writing VM until the reader catches up, so no more
+    than capacity values are ever in flight.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._values = [0] * capacity
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        return 'RingBuffer({}/{})'.format(self._count, self.capacity)
+
+    def __iter__(self) -> Iterator[int]:
+        for i in range(self._count):
+            yield self._values[(self._head + i) % self.capacity]
+
+    def put(self, value: int) -> None:
+        if self._count == self.capacity:
+            raise ChannelFull
+        self._values[(self._head + self._count) % self.capacity] = value
+        self._count += 1
+
+    def get(self) -> int:
+        if self._count == 0:
+            raise InputNotReady
+        value = self._values[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        return value
+
+    def extend(self, values: Iterable[int]) -> None:
+        for value in values:
+            self.put(value)
+
+    def drain(self) -> List[int]:
+        values = list(self)
+        self._head = 0
+        self._count = 0
+        return values
+
+    def empty(self) -> bool:
+        return self._count == 0
+
+    def full(self) -> bool:
+        return self._count == self.capacity
+
+
+class Broadcast():
+    """Output side of a node with several outgoing edges (fan-out)."""
+    def __init__(self, channels: List[RingBuffer]):
+        self.channels = channels
+
+    def put(self, value: int) -> None:
+        # All or nothing, so a retried OUTPUT never writes a value twice
+        if any(channel.full() for channel in self.channels):
+            raise ChannelFull
+        for channel in self.channels:
+            channel.put(value)
+
+
+class ConsoleInput():
+    """Asks the user for each input."""
+    def get(self) -> int:
+        return int(input("Program needs input (single integer plz): "))
+
+
+class ConsoleOutput():
+    """Prints each output."""
+    def put(self, value: int) -> None:
+        print("Program output: ", value)
@@ -0,0 +1,176 @@
+import json
+import os
+import signal
+
+from typing import Callable, Dict, List, Optional
+
+from .channels import Channel
+from .computer import PAUSED, Computer
+from .memory import PAGE_BITS, Memory, PagedMemory
+
+
+class Checkpointer():
+    """
+    Saves the state of a VM to a checkpoint log at path: memory, registers
+    and the values still waiting in its channels. Each save() appends one
+    JSON line holding only the memory pages written since the previous
+    save, so frequent checkpoints stay cheap. That needs PagedMemory;
+    with any other backend every save holds the whole of memory.
+
+    run() runs a VM and saves every every instructions (if given), on
+    each of save_signals, and once more at the end. A stop_signal saves
+    and returns right away, so a killed job can carry on with restore().
+    """
+    def __init__(self, path: str, every: Optional[int] = None,
+                 save_signals=(getattr(signal, 'SIGUSR1', None),),
+                 stop_signals=(signal.SIGTERM, signal.SIGINT)):
+        self.path = path
+        self.every = every
+        self.save_signals = [signum for signum in save_signals if signum is not None]
+        self.stop_signals = [signum for signum in stop_signals if signum is not None]
+        self.saves = 0
+        # Memory of the last save. Only later writes to that same memory
+        # can go in as an incremental record; any other starts a full one
+        self._memory = None
+        self._stop_requested = False
+
+    def __repr__(self) -> str:
+        return 'Checkpointer({}, {} saves)'.format(self.path, self.saves)
+
+    def save(self, computer: Computer) -> None:
+        memory = computer.opcodes
+        if isinstance(memory, PagedMemory):
+            page_bits = memory.page_bits
+            full = memory is not self._memory
+            pages = memory.all_pages() if full else memory.dirty_pages()
+        elif isinstance(memory, Memory):
+            page_bits = PAGE_BITS
+            pages = memory.pages(page_bits)
+            full = True
+        else:
+            page_bits = PAGE_BITS
+            values = list(memory)
+            page_size = 1 << page_bits
+            pages = {}
+            for start in range(0, len(values), page_size):
+                page = values[start:start + page_size]
+                # restore() gives back PagedMemory, which needs whole pages
+                page.extend([0] * (page_size - len(page)))
+                pages[start >> page_bits] = page
+            full = True
+
+        record = {
+            'instruction_pointer': computer.instruction_pointer,
+            'relative_base': computer.relative_base,
+            'keep_running': computer.keep_running,
+            'instruction_count': computer.instruction_count,
+            'inputs_consumed': computer.inputs_consumed,
+            'outputs_produced': computer.outputs_produced,
+            'operations': sorted(computer.operations) if computer.operations is not None else None,
+            'initial_inputs': list(computer.initial_inputs),
+            'inputs': list(computer.inputs),
+            'outputs': list(computer.outputs),
+            'page_bits': page_bits,
+            'full': full,
+            'pages': {str(page_number): page for page_number, page in pages.items()},
+        }
+        line = json.dumps(record) + '\n'
+        if full:
+            # Everything before a full record is redundant, so replace the
+            # log, atomically so that a crash keeps the old one
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        else:
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        if isinstance(memory, PagedMemory):
+            memory.mark_clean()
+        self._memory = memory
+        self.saves += 1
+
+    def run(self, computer: Computer) -> bool:
+        """
+        Run until the program stops or waits on a channel, checkpointing
+        along the way. Returns True while there is more to run, like
+        Computer.run().
+        """
+        def on_save(signum, frame):
+            computer.pause()
+
+        def on_stop(signum, frame):
+            self._stop_requested = True
+            computer.pause()
+
+        previous = {}
+        try:
+            for signum in self.save_signals:
+                previous[signum] = signal.signal(signum, on_save)
+            for signum in self.stop_signals:
+                previous[signum] = signal.signal(signum, on_stop)
+        except ValueError:
+            pass  # signals only work on the main thread
+
+        self._stop_requested = False
+        try:
+            while True:
+                if self.every is not None:
+                    computer.pause_at = computer.instruction_count + self.every
+                running = computer.run()
+                self.save(computer)
+                if not running or computer.status != PAUSED or self._stop_requested:
+                    return running
+        finally:
+            computer.pause_at = None
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+
+def restore(path: str, engine: Callable[..., Computer] = Computer, inputs=None, outputs=None,
+            profiler=None) -> Computer:
+    """
+    Build a VM of type engine in the state of the latest checkpoint in
+    the log at path, with PagedMemory. Values that were waiting in the
+    checkpointed channels are put into inputs and outputs (new Channels
+    by default). A last line cut short by a crash mid-write is skipped.
+    Raises ValueError if the log holds no checkpoint to restore.
+    """
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    if not records:
+        raise ValueError('no checkpoint to restore in {}'.format(path))
+
+    pages: Dict[int, List[int]] = {}
+    for record in records:
+        if record['full']:
+            pages = {}
+        for page_number, page in record['pages'].items():
+            pages[int(page_number)] = page
+    state = records[-1]
+
+    memory = PagedMemory.from_pages(pages, state['page_bits'])
+
+    inputs = inputs if inputs is not None else Channel()
+    outputs = outputs if outputs is not None else Channel()
+    inputs.extend(state['inputs'])
+    outputs.extend(state['outputs'])
+    computer = engine([], inputs, outputs, state['initial_inputs'], lambda _: memory,
+                      state['operations'], profiler)
+    computer._memory = lambda program: PagedMemory(program, state['page_bits'])
+    computer.instruction_pointer = state['instruction_pointer']
+    computer.relative_base = state['relative_base']
+    computer.keep_running = state['keep_running']
+    computer.instruction_count = state['instruction_count']
+    computer.inputs_consumed = state['inputs_consumed']
+    computer.outputs_produced = state['outputs_produced']
+    return computer
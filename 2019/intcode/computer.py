@@ -0,0 +1,616 @@
+import sys
+import time
+from collections import deque
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .channels import Channel, ChannelFull, InputNotReady
+from .memory import Memory, dense_region
+
+
+class OpcodeNotFound(Exception):
+    pass
+
+
+class ResourceLimitExceeded(Exception):
+    """The VM hit its instruction budget or deadline, see Computer."""
+    pass
+
+
+class BudgetExceeded(ResourceLimitExceeded):
+    pass
+
+
+class DeadlineExceeded(ResourceLimitExceeded):
+    pass
+
+
+class Deadlock(RuntimeError):
+    """Every VM run by run_round_robin() is waiting on a channel."""
+    pass
+
+
+OPCODE_BYTE_LEN = 2
+
+
+opcode_parameter_mode = {
+    1: {'operation': 'ADD', 'nargs': 3},
+    2: {'operation': 'MULTIPLY', 'nargs': 3},
+    3: {'operation': 'INPUT', 'nargs': 1},
+    4: {'operation': 'OUTPUT', 'nargs': 1},
+    5: {'operation': 'JUMP_IF_TRUE', 'nargs': 2},
+    6: {'operation': 'JUMP_IF_FALSE', 'nargs': 2},
+    7: {'operation': 'LESS_THAN', 'nargs': 3},
+    8: {'operation': 'EQUALS', 'nargs': 3},
+    9: {'operation': 'RELATIVE_BASE_OFFSET', 'nargs': 1},
+}
+
+opcode_no_parameter_mode = {
+    99: {'operation': 'STOP', 'nargs': 0},
+}
+
+param_mode_dict = {
+    0: 'POSITION',
+    1: 'IMMEDIATE',
+    2: 'RELATIVE',
+}
+
+POSITION = 0
+IMMEDIATE = 1
+RELATIVE = 2
+STOP = 99
+
+# Why run_until_io() returned
+HALTED = 'HALTED'
+NEEDS_INPUT = 'NEEDS_INPUT'
+HAS_OUTPUT = 'HAS_OUTPUT'
+OUTPUT_FULL = 'OUTPUT_FULL'
+PAUSED = 'PAUSED'
+
+# Instruction count that pause_at can never reach
+NEVER = sys.maxsize
+
+# Instructions between looks at the clock while there is a deadline
+DEADLINE_CHECK_INTERVAL = 1024
+
+
+# Raw opcode -> decoded form, shared by every VM since programs only
+# ever use a handful of distinct opcodes
+_decode_cache: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+
+_ALL_POSITION = (POSITION, POSITION, POSITION)
+
+# Operation -> name of the Computer method that runs it
+_HANDLER_NAMES = {
+    1: '_add',
+    2: '_multiply',
+    3: '_input',
+    4: '_output',
+    5: '_jump_if_true',
+    6: '_jump_if_false',
+    7: '_less_than',
+    8: '_equals',
+    9: '_relative_base_offset',
+    STOP: '_stop',
+}
+
+
+class _DefaultChannel():
+    """
+    Channel a VM makes for itself the first time it uses one it wasn't
+    given. Many VMs (every run of a day 2 search) never touch a channel.
+    """
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, computer, owner=None):
+        if computer is None:
+            return self
+        # Set on the VM, which hides this descriptor from then on
+        channel = Channel()
+        setattr(computer, self.name, channel)
+        return channel
+
+
+class _Limit():
+    """
+    One of a VM's limits (None for none), see Computer. Setting it keeps
+    the VM's _limited flag up to date, so that process() can tell there
+    are no limits at all from one attribute.
+    """
+    def __set_name__(self, owner, name: str):
+        self.name = '_' + name
+
+    def __get__(self, computer, owner=None):
+        if computer is None:
+            return self
+        return computer.__dict__.get(self.name)
+
+    def __set__(self, computer, value) -> None:
+        computer.__dict__[self.name] = value
+        computer._limited = (computer.pause_at is not None
+                             or computer.instruction_budget is not None
+                             or computer.deadline is not None)
+
+
+def decode(opcode: int) -> Tuple[int, Tuple[int, ...]]:
+    """
+    Split a raw opcode (e.g. 1002) into its integer operation (2) and a
+    tuple of integer parameter modes, first parameter first ((0, 1, 0)).
+    """
+    try:
+        return _decode_cache[opcode]
+    except KeyError:
+        pass
+
+    if opcode < 0:
+        raise OpcodeNotFound
+    operation = opcode % 100
+    if operation == STOP:
+        modes = ()
+    else:
+        try:
+            nargs = opcode_parameter_mode[operation]['nargs']
+        except KeyError:
+            raise OpcodeNotFound
+        modes = tuple((opcode // 10 ** (arg + OPCODE_BYTE_LEN)) % 10
+                      for arg in range(nargs))
+        if any(mode not in param_mode_dict for mode in modes):
+            raise OpcodeNotFound
+        if modes == _ALL_POSITION:
+            modes = _ALL_POSITION
+
+    decoded = _decode_cache[opcode] = (operation, modes)
+    return decoded
+
+
+class Computer():
+    """
+    Intcode VM. Each distinct opcode is decoded once into an integer
+    operation and a tuple of parameter modes, and instructions are
+    dispatched through a table of handlers.
+
+    inputs and outputs can be anything with get() and put() respectively:
+    Channels for VMs sharing a thread, Queues for VMs on their own threads,
+    or the console. initial_inputs are read first, before anything from
+    inputs (an amplifier's phase setting, say, zero included). operations,
+    if given, restricts the instruction set to those raw opcodes (day 2
+    only knows 1, 2 and 99, so no parameter modes either). profiler, if given, is a Profiler that records
+    every instruction this VM runs.
+
+    instruction_budget caps the total number of instructions and deadline
+    (a time.monotonic() value, see set_timeout()) caps wall-clock time.
+    Going over either raises BudgetExceeded or DeadlineExceeded between
+    two instructions, leaving the VM in a consistent state. The clock is
+    only read every DEADLINE_CHECK_INTERVAL instructions, and a VM with
+    neither limit runs a loop that checks for neither.
+    """
+    # Defaults that most VMs never change, kept on the class so that
+    # construction (once per run when searching) stays cheap
+    relative_base = 0
+    pause_on_output = False
+    inputs = _DefaultChannel()
+    outputs = _DefaultChannel()
+    # Instruction count to pause at, see pause()
+    pause_at = _Limit()
+    instruction_budget = _Limit()
+    deadline = _Limit()
+    _limited = False
+    elapsed = 0.0  # seconds spent in run(), see __init__ for the other costs
+    # Empty unless given, see __init__
+    initial_inputs: Sequence[int] = ()
+    operations: Optional[Iterable[int]] = None
+    profiler = None
+    # Whether process() may run ADD, MULTIPLY and STOP itself rather than
+    # through their handlers, see __init_subclass__
+    _inline = True
+    # Raw opcode -> decoded form. Unrestricted VMs share the global cache.
+    _decoded = _decode_cache
+    # Operation -> handler, called with the VM. Built once per class, see
+    # __init_subclass__, and only copied for a VM that is profiled.
+    _handlers: Dict[int, Callable[['Computer', int, Tuple[int, ...]], None]] = {}
+
+    def __init__(self, opcodes: List[int], inputs=None, outputs=None,
+                 initial_inputs: Optional[Iterable[int]] = None,
+                 memory: Callable[[List[int]], Memory] = Memory,
+                 operations: Optional[Iterable[int]] = None,
+                 profiler=None):
+        # opcodes == memory, which grows to whatever addresses the program uses
+        self.opcodes = memory(opcodes)
+        self._memory = memory
+        # Everything process() writes is set here, as adding an attribute
+        # to a VM later costs far more than changing one
+        self.instruction_pointer = 0
+        self.keep_running = True
+        # Set while paused on an INPUT with nothing to read, or an OUTPUT
+        # with nowhere to write
+        self.waiting = False
+        self.status: Optional[str] = None
+        # Cost counters, for schedulers to account for each run
+        self.instruction_count = 0
+        self.inputs_consumed = 0
+        self.outputs_produced = 0
+        if inputs is not None:
+            self.inputs = inputs
+        if outputs is not None:
+            self.outputs = outputs
+        if initial_inputs:
+            # Read before anything from inputs, e.g. an amplifier's phase setting
+            self.initial_inputs = deque(initial_inputs)
+        if operations is not None:
+            self.operations = operations
+            # Anything missing from the table goes through _decode()
+            self._decoded = {opcode: decode(opcode) for opcode in operations}
+            if any(opcode not in operations for opcode in (1, 2, STOP)):
+                self._inline = False
+        if profiler is not None:
+            self.profiler = profiler
+            profiler.instrument(self)
+            self._inline = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # A subclass may override handlers, so it gets a table of its own
+        cls._handlers = cls._handler_table()
+        cls._inline = (cls._add is Computer._add and cls._multiply is Computer._multiply
+                       and cls._stop is Computer._stop)
+
+    @classmethod
+    def _handler_table(cls) -> Dict[int, Callable]:
+        return {operation: getattr(cls, name) for operation, name in _HANDLER_NAMES.items()}
+
+    def process(self) -> None:
+        if self._limited:
+            self._process_limited()
+            return
+
+        handlers = self._handlers
+        opcodes = self.opcodes
+        decoded = self._decoded
+        # Addresses inside memory's dense region are read and written on it
+        # directly, skipping the memory's own checks. Runs of ADD and
+        # MULTIPLY with every parameter in position mode (most of what
+        # programs run) are run right here while all of their addresses
+        # are inside it, with the instruction pointer kept in a local, and
+        # so is the STOP at the end.
+        dense = opcodes if type(opcodes) is list else dense_region(opcodes)
+        size = len(dense) if dense is not None else 0
+        inline = self._inline
+        arithmetic_end = size - 3 if inline else 0
+        # Counted locally, nothing reads the count until the loop is over
+        count = 0
+        try:
+            while self.keep_running and not self.waiting:
+                index = start = self.instruction_pointer
+                try:
+                    while 0 <= index < arithmetic_end:
+                        opcode = dense[index]
+                        if opcode != 1 and opcode != 2:
+                            break
+                        address_1 = dense[index + 1]
+                        address_2 = dense[index + 2]
+                        address_3 = dense[index + 3]
+                        if address_1 < 0 or address_2 < 0 or address_3 < 0:
+                            break
+                        if opcode == 1:
+                            dense[address_3] = dense[address_1] + dense[address_2]
+                        else:
+                            dense[address_3] = dense[address_1] * dense[address_2]
+                        index += 4
+                except IndexError:
+                    # Past the dense region, before anything was written.
+                    # The handler runs it on memory itself.
+                    pass
+                count += (index - start) >> 2
+                self.instruction_pointer = index
+
+                opcode = dense[index] if 0 <= index < size else opcodes[index]
+                if opcode == STOP and inline:
+                    self.keep_running = False
+                    self.status = HALTED
+                    count += 1
+                    break
+                try:
+                    operation, modes = decoded[opcode]
+                except KeyError:
+                    operation, modes = self._decode(opcode)
+                handlers[operation](self, index, modes)
+                count += 1
+        finally:
+            self.instruction_count += count
+
+    def _process_limited(self) -> None:
+        # process(), plus a check of the count before every instruction
+        handlers = self._handlers
+        opcodes = self.opcodes
+        decoded = self._decoded
+        check_at = self._next_check()
+        while self.keep_running and not self.waiting:
+            if self.instruction_count >= check_at:
+                if self._check_limits():
+                    break
+                check_at = self._next_check()
+            index = self.instruction_pointer
+            try:
+                operation, modes = decoded[opcodes[index]]
+            except KeyError:
+                operation, modes = self._decode(opcodes[index])
+            handlers[operation](self, index, modes)
+            self.instruction_count += 1
+
+    def _decode(self, opcode: int) -> Tuple[int, Tuple[int, ...]]:
+        # An opcode missing from _decoded is new, or outside of operations
+        if self.operations is not None:
+            raise OpcodeNotFound
+        return decode(opcode)
+
+    def limited(self) -> bool:
+        """Whether there is a pause_at, instruction budget or deadline."""
+        return self._limited
+
+    def _next_check(self) -> int:
+        # The instruction count at which _check_limits() has to run next
+        check_at = NEVER
+        if self.pause_at is not None:
+            check_at = min(check_at, self.pause_at)
+        if self.instruction_budget is not None:
+            check_at = min(check_at, self.instruction_budget)
+        if self.deadline is not None:
+            check_at = min(check_at, self.instruction_count + DEADLINE_CHECK_INTERVAL)
+        return check_at
+
+    def _check_limits(self) -> bool:
+        # Raises if over a limit, returns True if it is time to pause
+        if self.instruction_budget is not None and self.instruction_count >= self.instruction_budget:
+            raise BudgetExceeded('{} instructions'.format(self.instruction_count))
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded('{} instructions'.format(self.instruction_count))
+        if self.pause_at is not None and self.instruction_count >= self.pause_at:
+            self.pause()
+            return True
+        return False
+
+    def set_timeout(self, seconds: float) -> None:
+        """Set the deadline to seconds from now."""
+        self.deadline = time.monotonic() + seconds
+
+    def run(self) -> bool:
+        """
+        Run until the program stops or waits on an empty or full channel.
+        Returns True while there is more to run.
+        """
+        self.waiting = False
+        start = time.perf_counter()
+        try:
+            self.process()
+        finally:
+            self.elapsed += time.perf_counter() - start
+        return self.keep_running
+
+    def pause(self) -> None:
+        """
+        Stop at the next instruction boundary with status PAUSED, e.g. from
+        a signal handler. run() picks up where it left off.
+        """
+        self.waiting = True
+        self.status = PAUSED
+
+    def run_until_io(self) -> str:
+        """
+        Run until the program stops, needs an input that isn't there yet,
+        or has written an output, and return which of HALTED, NEEDS_INPUT,
+        HAS_OUTPUT (or OUTPUT_FULL on a full channel) it was. Call again
+        to resume.
+        """
+        self.pause_on_output = True
+        try:
+            self.run()
+        finally:
+            self.pause_on_output = False
+        return self.status
+
+    def stream(self, inputs: Iterable[int] = ()) -> Iterator[int]:
+        """
+        Generate the program's outputs, feeding it the next value of inputs
+        each time it needs one. Stops when the program does, or when it
+        needs an input and inputs has run out. Needs Channel inputs and
+        outputs (the default).
+        """
+        inputs = iter(inputs)
+        while True:
+            status = self.run_until_io()
+            if status == HAS_OUTPUT:
+                yield from self.drain()
+            elif status == NEEDS_INPUT:
+                try:
+                    self.inputs.put(next(inputs))
+                except StopIteration:
+                    return
+            elif status == HALTED:
+                yield from self.drain()
+                return
+            else:
+                raise RuntimeError('stream() needs an unbounded output channel')
+
+    def feed(self, values: Iterable[int]) -> None:
+        """Queue up several inputs at once."""
+        self.inputs.extend(values)
+
+    def drain(self) -> List[int]:
+        """Take every output written so far."""
+        return self.outputs.drain()
+
+    def fork(self, inputs=None, outputs=None) -> 'Computer':
+        """
+        Return a new VM of the same type that carries on from the current
+        state. With PagedMemory the clone shares every unchanged page with
+        this VM, and a page is only copied when one of them writes to it.
+        """
+        clone = type(self)([], inputs, outputs, self.initial_inputs,
+                           lambda _: self.opcodes.copy(), self.operations, self.profiler)
+        clone._memory = self._memory
+        clone.instruction_pointer = self.instruction_pointer
+        clone.relative_base = self.relative_base
+        clone.keep_running = self.keep_running
+        return clone
+
+    def reload(self, opcodes: List[int]) -> None:
+        """
+        Start over on opcodes, in a fresh memory of the same kind, keeping
+        the channels, restrictions and limits. Cheaper than building a new
+        VM for every run of a search.
+        """
+        self.opcodes = self._memory(opcodes)
+        self.instruction_pointer = 0
+        self.relative_base = 0
+        self.keep_running = True
+        self.waiting = False
+        self.status = None
+        self.instruction_count = 0
+        self.inputs_consumed = 0
+        self.outputs_produced = 0
+
+    def snapshot(self) -> 'Computer':
+        """
+        Freeze the current state. Fork the snapshot to start each run from
+        it, while this VM is free to keep going.
+        """
+        return self.fork()
+
+    def _read(self, index: int, mode: int) -> int:
+        if mode == POSITION:
+            return self.opcodes[self.opcodes[index]]
+        elif mode == IMMEDIATE:
+            return self.opcodes[index]
+        return self.opcodes[self.opcodes[index] + self.relative_base]
+
+    def _write(self, index: int, mode: int, value: int) -> int:
+        # Returns the address written, for engines that track code changes
+        if mode == POSITION:
+            position = self.opcodes[index]
+        elif mode == IMMEDIATE:
+            position = index
+        else:
+            position = self.opcodes[index] + self.relative_base
+        self.opcodes[position] = value
+        return position
+
+    def _add(self, index: int, modes: Tuple[int, ...]) -> None:
+        opcodes = self.opcodes
+        if modes is _ALL_POSITION:
+            # Inlined common case: every parameter is an address. This skips
+            # _write, so BlockComputer overrides _add and _multiply.
+            opcodes[opcodes[index + 3]] = opcodes[opcodes[index + 1]] + opcodes[opcodes[index + 2]]
+        else:
+            result = self._read(index + 1, modes[0]) + self._read(index + 2, modes[1])
+            self._write(index + 3, modes[2], result)
+        self.instruction_pointer = index + 4
+
+    def _multiply(self, index: int, modes: Tuple[int, ...]) -> None:
+        opcodes = self.opcodes
+        if modes is _ALL_POSITION:
+            opcodes[opcodes[index + 3]] = opcodes[opcodes[index + 1]] * opcodes[opcodes[index + 2]]
+        else:
+            result = self._read(index + 1, modes[0]) * self._read(index + 2, modes[1])
+            self._write(index + 3, modes[2], result)
+        self.instruction_pointer = index + 4
+
+    def _input(self, index: int, modes: Tuple[int, ...]) -> None:
+        if self.initial_inputs:
+            input_value = self.initial_inputs.popleft()
+        else:
+            try:
+                input_value = self.inputs.get()
+            except InputNotReady:
+                self.waiting = True
+                self.status = NEEDS_INPUT
+                return
+        self.inputs_consumed += 1
+        self._write(index + 1, modes[0], input_value)
+        self.instruction_pointer = index + 2
+
+    def _output(self, index: int, modes: Tuple[int, ...]) -> None:
+        value = self._read(index + 1, modes[0])
+        try:
+            self.outputs.put(value)
+        except ChannelFull:
+            self.waiting = True
+            self.status = OUTPUT_FULL
+            return
+        self.outputs_produced += 1
+        self.instruction_pointer = index + 2
+        if self.pause_on_output:
+            self.waiting = True
+            self.status = HAS_OUTPUT
+
+    def _jump_if_true(self, index: int, modes: Tuple[int, ...]) -> None:
+        """
+        if the first parameter is non-zero, it sets the instruction pointer
+        to the value from the second parameter. Otherwise, it does nothing.
+        """
+        if self._read(index + 1, modes[0]) != 0:
+            self.instruction_pointer = self._read(index + 2, modes[1])
+        else:
+            self.instruction_pointer = index + 3
+
+    def _jump_if_false(self, index: int, modes: Tuple[int, ...]) -> None:
+        """
+        if the first parameter is zero, it sets the instruction pointer
+        to the value from the second parameter. Otherwise, it does nothing.
+        """
+        if self._read(index + 1, modes[0]) == 0:
+            self.instruction_pointer = self._read(index + 2, modes[1])
+        else:
+            self.instruction_pointer = index + 3
+
+    def _less_than(self, index: int, modes: Tuple[int, ...]) -> None:
+        """
+        if the first parameter is less than the second parameter, it
+        stores 1 in the position given by the third parameter. Otherwise,
+        it stores 0.
+        """
+        value_1 = self._read(index + 1, modes[0])
+        value_2 = self._read(index + 2, modes[1])
+        self._write(index + 3, modes[2], 1 if value_1 < value_2 else 0)
+        self.instruction_pointer = index + 4
+
+    def _equals(self, index: int, modes: Tuple[int, ...]) -> None:
+        """
+        if the first parameter is equal to the second parameter, it
+        stores 1 in the position given by the third parameter. Otherwise,
+        it stores 0.
+        """
+        value_1 = self._read(index + 1, modes[0])
+        value_2 = self._read(index + 2, modes[1])
+        self._write(index + 3, modes[2], 1 if value_1 == value_2 else 0)
+        self.instruction_pointer = index + 4
+
+    def _relative_base_offset(self, index: int, modes: Tuple[int, ...]) -> None:
+        self.relative_base += self._read(index + 1, modes[0])
+        self.instruction_pointer = index + 2
+
+    def _stop(self, index: int, modes: Tuple[int, ...]) -> None:
+        self.keep_running = False
+        self.status = HALTED
+
+
+Computer._handlers = Computer._handler_table()
+
+
+def run_round_robin(computers: List[Computer]) -> None:
+    """
+    Cooperatively run VMs connected by channels on a single thread. Each
+    VM in turn runs until it stops or waits on a channel, until all of
+    them have stopped. Raises Deadlock if they all wait and none can move.
+    """
+    def transfers() -> int:
+        return sum(computer.inputs_consumed + computer.outputs_produced
+                   for computer in running)
+
+    running = list(computers)
+    while running:
+        before = transfers()
+        still_running = [computer for computer in running if computer.run()]
+        if len(still_running) == len(running) and transfers() == before:
+            raise Deadlock('every VM is waiting on a channel')
+        running = still_running
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+from array import array
+
+from typing import List, Optional
+
+from .computer import OpcodeNotFound, _ALL_POSITION, _decode_cache, decode
+
+
+# Columns of each row in a stored decode table: raw opcode, operation,
+# number of parameters, then a mode per parameter (up to three)
+DECODED_COLUMNS = 6
+
+
+def default_cache_dir() -> str:
+    return os.environ.get('INTCODE_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'intcode'))
+
+
+def parse_program(text: str) -> List[int]:
+    return [int(x) for x in text.split(',')]
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # Concurrent jobs may race to fill the cache, so never leave half a file
+    directory = os.path.dirname(path)
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _decode_table(program: array) -> array:
+    table = array('q')
+    # An opcode has at most two digits of operation and three of modes
+    for opcode in sorted(value for value in set(program) if 0 < value < 100000):
+        try:
+            operation, modes = decode(opcode)
+        except OpcodeNotFound:
+            continue  # data, not an instruction
+        table.extend((opcode, operation, len(modes)))
+        table.extend(modes + (0,) * (DECODED_COLUMNS - 3 - len(modes)))
+    return table
+
+
+def _prime_decode_cache(table: array) -> None:
+    for row in range(0, len(table), DECODED_COLUMNS):
+        opcode, operation, nargs = table[row:row + 3]
+        if opcode not in _decode_cache:
+            modes = tuple(table[row + 3:row + 3 + nargs])
+            if modes == _ALL_POSITION:
+                modes = _ALL_POSITION
+            _decode_cache[opcode] = (operation, modes)
+
+
+def load_program(path: str = 'input.txt', cache_dir: Optional[str] = None) -> List[int]:
+    """
+    Read a comma separated Intcode program. The parsed program is stored
+    as packed 64-bit ints in cache_dir, keyed by a hash of the file, along
+    with the decoded form of every distinct value in it that is a valid
+    opcode. A repeat load of the same file reads both straight back in,
+    skipping parsing, and fills the VM's decode memo so nothing has to be
+    decoded at run time either.
+
+    Programs with values that don't fit in 64 bits are parsed every time.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    cache_dir = cache_dir or default_cache_dir()
+    key = hashlib.sha256(raw).hexdigest()
+    program_path = os.path.join(cache_dir, key + '.program')
+    decoded_path = os.path.join(cache_dir, key + '.decoded')
+
+    try:
+        program = array('q')
+        with open(program_path, 'rb') as f:
+            program.frombytes(f.read())
+        table = array('q')
+        with open(decoded_path, 'rb') as f:
+            table.frombytes(f.read())
+    except (OSError, ValueError):
+        opcodes = parse_program(raw.decode())
+        try:
+            program = array('q', opcodes)
+        except OverflowError:
+            return opcodes
+        table = _decode_table(program)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_atomic(program_path, program.tobytes())
+            _write_atomic(decoded_path, table.tobytes())
+        except OSError:
+            pass  # read-only or full disk, just don't cache
+
+    _prime_decode_cache(table)
+    return program.tolist()
@@ -0,0 +1,332 @@
+from array import array
+
+from typing import Dict, Iterator, List, MutableSequence, Optional, Set
+
+
+# Number of cells per page in PagedMemory, as a power of two
+PAGE_BITS = 10
+
+
+class Memory():
+    """
+    Growable Intcode memory. The program is held in a dense region, and
+    any address written past the end of it goes into a sparse overflow
+    dict. Unwritten cells read as 0, so constructing a VM is O(program
+    size) no matter how far out the program addresses memory.
+    """
+    # A new Memory per run is the norm when searching, so it's kept small
+    __slots__ = ('_dense', '_size', '_sparse')
+
+    def __init__(self, opcodes: List[int]):
+        self._dense: MutableSequence[int] = self._make_dense(opcodes)
+        self._size = len(self._dense)
+        self._sparse: Dict[int, int] = {}
+
+    def _make_dense(self, opcodes: List[int]) -> MutableSequence[int]:
+        return list(opcodes)
+
+    def __getitem__(self, address: int) -> int:
+        if 0 <= address < self._size:
+            return self._dense[address]
+        elif address < 0:
+            raise IndexError('negative address {}'.format(address))
+        return self._sparse.get(address, 0)
+
+    def __setitem__(self, address: int, value: int) -> None:
+        if 0 <= address < self._size:
+            self._dense[address] = value
+        elif address < 0:
+            raise IndexError('negative address {}'.format(address))
+        else:
+            self._sparse[address] = value
+
+    def __len__(self) -> int:
+        # One past the highest address that holds a value
+        return max(self._size, max(self._sparse, default=-1) + 1)
+
+    def __iter__(self) -> Iterator[int]:
+        for address in range(len(self)):
+            yield self[address]
+
+    def __repr__(self) -> str:
+        return '{}({} dense, {} sparse)'.format(
+            type(self).__name__, self._size, len(self._sparse))
+
+    def copy(self) -> 'Memory':
+        clone = type(self).__new__(type(self))
+        clone._dense = self._dense[:]
+        clone._size = self._size
+        clone._sparse = self._sparse.copy()
+        return clone
+
+    def to_list(self) -> List[int]:
+        return list(self)
+
+    def pages(self, page_bits: int = PAGE_BITS) -> Dict[int, List[int]]:
+        """
+        Every page of memory that holds a value, padded with 0s, by page
+        number (as for PagedMemory). Far out sparse addresses only cost
+        the page they are on.
+        """
+        page_size = 1 << page_bits
+        pages = {}
+        for start in range(0, self._size, page_size):
+            page = [self[address] for address in range(start, min(start + page_size, self._size))]
+            page.extend([0] * (page_size - len(page)))
+            pages[start >> page_bits] = page
+        for address, value in self._sparse.items():
+            page_number = address >> page_bits
+            if page_number not in pages:
+                pages[page_number] = [0] * page_size
+            pages[page_number][address & (page_size - 1)] = value
+        return pages
+
+
+def dense_region(memory) -> Optional[List[int]]:
+    """
+    The plain list inside memory that holds every address from 0 up to its
+    length, which the interpreter may read and write directly, or None if
+    memory has no such list or has to see every access itself.
+    """
+    memory_type = type(memory)
+    if memory_type is list:
+        return memory
+    if memory_type is Memory:
+        return memory._dense
+    return None
+
+
+class ArrayMemory(Memory):
+    """
+    Memory whose dense region is a packed array('q') of 64-bit ints
+    (8 bytes per cell rather than a pointer to a Python int object).
+
+    The array rejects any value that doesn't fit in 64 bits, and the first
+    time that happens the whole dense region is promoted to a list of
+    Python ints for the rest of the run. Results are always exact, and
+    reads cost the same either way.
+    """
+    promoted = False
+
+    def _make_dense(self, opcodes: List[int]) -> MutableSequence[int]:
+        try:
+            return array('q', opcodes)
+        except OverflowError:
+            self.promoted = True
+            return list(opcodes)
+
+    def __setitem__(self, address: int, value: int) -> None:
+        if 0 <= address < self._size:
+            try:
+                self._dense[address] = value
+            except OverflowError:
+                self._promote(address, value)
+        elif address < 0:
+            raise IndexError('negative address {}'.format(address))
+        else:
+            self._sparse[address] = value
+
+    def _promote(self, address: int, value: int) -> None:
+        self._dense = list(self._dense)
+        self.promoted = True
+        self._dense[address] = value
+
+    def copy(self) -> 'ArrayMemory':
+        clone = super().copy()
+        clone.promoted = self.promoted
+        return clone
+
+
+# Marks a cell of PerCellArrayMemory whose value lives in its big dict
+BIG = -2 ** 63
+
+
+class PerCellArrayMemory(ArrayMemory):
+    """
+    ArrayMemory that promotes one cell at a time. A cell whose value
+    doesn't fit in 64 bits holds the BIG marker in the array, with the
+    value itself kept in a dict, so the rest of memory stays packed. Each
+    read costs one extra comparison against the marker.
+    """
+    def __init__(self, opcodes: List[int]):
+        self._big: Dict[int, int] = {}
+        super().__init__(opcodes)
+
+    def _make_dense(self, opcodes: List[int]) -> MutableSequence[int]:
+        dense = array('q')
+        for address, value in enumerate(opcodes):
+            try:
+                dense.append(value)
+            except OverflowError:
+                dense.append(BIG)
+                self._big[address] = value
+        return dense
+
+    def __getitem__(self, address: int) -> int:
+        if 0 <= address < self._size:
+            value = self._dense[address]
+            if value == BIG:
+                # BIG itself is a valid value, kept in the array as is
+                return self._big.get(address, value)
+            return value
+        elif address < 0:
+            raise IndexError('negative address {}'.format(address))
+        return self._sparse.get(address, 0)
+
+    def __setitem__(self, address: int, value: int) -> None:
+        if 0 <= address < self._size:
+            if self._big:
+                self._big.pop(address, None)
+            try:
+                self._dense[address] = value
+            except OverflowError:
+                self._promote(address, value)
+        elif address < 0:
+            raise IndexError('negative address {}'.format(address))
+        else:
+            self._sparse[address] = value
+
+    def _promote(self, address: int, value: int) -> None:
+        self._dense[address] = BIG
+        self._big[address] = value
+        self.promoted = True
+
+    def copy(self) -> 'PerCellArrayMemory':
+        clone = super().copy()
+        clone._big = self._big.copy()
+        return clone
+
+
+class BoundedMemory(list):
+    """
+    A plain list that also rejects negative addresses, which a list would
+    count from the end. Every address outside of the program raises
+    IndexError. Slower than 'list', so it's meant for checking results.
+    """
+    def __getitem__(self, address: int) -> int:
+        if address < 0:
+            raise IndexError('negative address {}'.format(address))
+        return list.__getitem__(self, address)
+
+    def __setitem__(self, address: int, value: int) -> None:
+        if address < 0:
+            raise IndexError('negative address {}'.format(address))
+        list.__setitem__(self, address, value)
+
+    def copy(self) -> 'BoundedMemory':
+        return BoundedMemory(self)
+
+
+class PagedMemory():
+    """
+    Memory split into fixed-size pages that are only allocated once
+    written. Copies share every page with the original and a page is
+    copied the first time either side writes to it (copy-on-write), so
+    a copy costs O(pages) and then grows with the pages it touches.
+    """
+    def __init__(self, opcodes: List[int], page_bits: int = PAGE_BITS):
+        self.page_bits = page_bits
+        self.page_size = page_size = 1 << page_bits
+        self._mask = page_size - 1
+        self._pages: Dict[int, List[int]] = {}
+        # Pages this instance may write in place; all others are shared
+        self._owned: Set[int] = set()
+        # Pages written since the last mark_clean()
+        self._dirty: Set[int] = set()
+        # Owned pages that are already dirty, which writes go straight to
+        self._writable: Set[int] = set()
+        opcodes = list(opcodes)
+        for start in range(0, len(opcodes), page_size):
+            page = opcodes[start:start + page_size]
+            page.extend([0] * (page_size - len(page)))
+            self._pages[start // page_size] = page
+            self._owned.add(start // page_size)
+        self._dirty = set(self._pages)
+        self._writable = set(self._pages)
+
+    @classmethod
+    def from_pages(cls, pages: Dict[int, List[int]], page_bits: int = PAGE_BITS) -> 'PagedMemory':
+        """Memory made up of the given pages, by page number."""
+        memory = cls([], page_bits)
+        memory._pages = pages
+        memory._owned = set(pages)
+        memory._dirty = set(pages)
+        memory._writable = set(pages)
+        return memory
+
+    def __getitem__(self, address: int) -> int:
+        try:
+            return self._pages[address >> self.page_bits][address & self._mask]
+        except KeyError:
+            if address < 0:
+                raise IndexError('negative address {}'.format(address))
+            return 0
+
+    def __setitem__(self, address: int, value: int) -> None:
+        if address < 0:
+            raise IndexError('negative address {}'.format(address))
+        page_number = address >> self.page_bits
+        if page_number not in self._writable:
+            if page_number not in self._owned:
+                try:
+                    page = self._pages[page_number][:]
+                except KeyError:
+                    page = [0] * self.page_size
+                self._pages[page_number] = page
+                self._owned.add(page_number)
+            self._dirty.add(page_number)
+            self._writable.add(page_number)
+        self._pages[page_number][address & self._mask] = value
+
+    def __len__(self) -> int:
+        return (max(self._pages, default=-1) + 1) * self.page_size
+
+    def __iter__(self) -> Iterator[int]:
+        for address in range(len(self)):
+            yield self[address]
+
+    def __repr__(self) -> str:
+        return 'PagedMemory({} pages, {} owned)'.format(len(self._pages), len(self._owned))
+
+    def copy(self) -> 'PagedMemory':
+        clone = PagedMemory.__new__(PagedMemory)
+        clone.page_bits = self.page_bits
+        clone.page_size = self.page_size
+        clone._mask = self._mask
+        clone._pages = self._pages.copy()
+        clone._owned = set()
+        clone._dirty = set(self._dirty)
+        clone._writable = set()
+        # Pages are now shared, so the original must copy before writing
+        # too. What it has written since its last checkpoint stays dirty.
+        self._owned = set()
+        self._writable = set()
+        return clone
+
+    def all_pages(self) -> Dict[int, List[int]]:
+        return dict(self._pages)
+
+    def dirty_pages(self) -> Dict[int, List[int]]:
+        """
+        Pages written since the last mark_clean() (every page to begin
+        with), by page number.
+        """
+        return {page_number: self._pages[page_number] for page_number in self._dirty}
+
+    def mark_clean(self) -> None:
+        self._dirty = set()
+        self._writable = set()
+
+    def to_list(self) -> List[int]:
+        return list(self)
+
+
+BACKENDS = {
+    # A plain list is fastest, for programs that never address past their end
+    'list': list,
+    'bounded': BoundedMemory,
+    'sparse': Memory,
+    'array': ArrayMemory,
+    'array-cell': PerCellArrayMemory,
+    'paged': PagedMemory,
+}
@@ -0,0 +1,156 @@
+import json
+import time
+
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+from .computer import opcode_no_parameter_mode, opcode_parameter_mode
+
+
+JUMP_IF_TRUE = 5
+JUMP_IF_FALSE = 6
+INPUT = 3
+
+
+def _operation_name(operation: int) -> str:
+    for table in (opcode_parameter_mode, opcode_no_parameter_mode):
+        if operation in table:
+            return table[operation]['operation']
+    return str(operation)
+
+
+class Profiler():
+    """
+    Instruction-level profile of one or more Intcode VMs. Pass it to a
+    Computer as profiler= and it wraps that VM's handler table, counting
+    executions per address and per operation, jumps taken and not taken
+    per address, and the time spent in INPUT (waiting on a value) versus
+    every other instruction (compute). A VM built without a profiler runs
+    the unwrapped handlers, so profiling costs nothing when it is off.
+
+    Backward jumps taken are recorded as loops: (jump address, target).
+    """
+    def __init__(self):
+        self.address_counts: Counter = Counter()
+        self.operation_counts: Counter = Counter()
+        self.jumps_taken: Counter = Counter()
+        self.jumps_not_taken: Counter = Counter()
+        self.loops: Counter = Counter()
+        self.input_stalls = 0
+        self.input_wait_time = 0.0
+        self.compute_time = 0.0
+
+    def __repr__(self) -> str:
+        return 'Profiler({} instructions)'.format(sum(self.operation_counts.values()))
+
+    def instrument(self, computer) -> None:
+        """Wrap every handler of computer to record into this profile."""
+        computer._handlers = {operation: self._wrap(operation, handler)
+                              for operation, handler in computer._handlers.items()}
+
+    def _wrap(self, operation: int, handler: Callable) -> Callable:
+        address_counts = self.address_counts
+        operation_counts = self.operation_counts
+        clock = time.perf_counter
+
+        if operation == INPUT:
+            def profiled(computer, index: int, modes: Tuple[int, ...]) -> None:
+                start = clock()
+                handler(computer, index, modes)
+                self.input_wait_time += clock() - start
+                if computer.waiting:
+                    # Nothing to read yet, the instruction runs again later
+                    self.input_stalls += 1
+                    return
+                address_counts[index] += 1
+                operation_counts[operation] += 1
+            return profiled
+
+        if operation in (JUMP_IF_TRUE, JUMP_IF_FALSE):
+            def profiled(computer, index: int, modes: Tuple[int, ...]) -> None:
+                start = clock()
+                condition = computer._read(index + 1, modes[0]) != 0
+                handler(computer, index, modes)
+                self.compute_time += clock() - start
+                address_counts[index] += 1
+                operation_counts[operation] += 1
+                if condition == (operation == JUMP_IF_TRUE):
+                    self.jumps_taken[index] += 1
+                    if computer.instruction_pointer <= index:
+                        self.loops[(index, computer.instruction_pointer)] += 1
+                else:
+                    self.jumps_not_taken[index] += 1
+            return profiled
+
+        def profiled(computer, index: int, modes: Tuple[int, ...]) -> None:
+            start = clock()
+            handler(computer, index, modes)
+            self.compute_time += clock() - start
+            address_counts[index] += 1
+            operation_counts[operation] += 1
+        return profiled
+
+    def hot_addresses(self, top: int = 10) -> List[Tuple[int, int]]:
+        return self.address_counts.most_common(top)
+
+    def hot_loops(self, top: int = 10) -> List[Dict]:
+        """
+        The loops that ran the most instructions. A loop spans from its
+        target up to and including the backward jump that closes it.
+        """
+        loops = []
+        for (jump, target), iterations in self.loops.items():
+            instructions = sum(count for address, count in self.address_counts.items()
+                               if target <= address <= jump)
+            loops.append({'start': target, 'end': jump, 'iterations': iterations,
+                          'instructions': instructions})
+        loops.sort(key=lambda loop: loop['instructions'], reverse=True)
+        return loops[:top]
+
+    def to_dict(self, top: int = 10) -> Dict:
+        return {
+            'instructions': sum(self.operation_counts.values()),
+            'operations': {_operation_name(operation): count
+                           for operation, count in self.operation_counts.most_common()},
+            'hot_addresses': [{'address': address, 'count': count}
+                              for address, count in self.hot_addresses(top)],
+            'hot_loops': self.hot_loops(top),
+            'jumps': {str(address): {'taken': self.jumps_taken[address],
+                                     'not_taken': self.jumps_not_taken[address]}
+                      for address in sorted(set(self.jumps_taken) | set(self.jumps_not_taken))},
+            'input_stalls': self.input_stalls,
+            'input_wait_seconds': self.input_wait_time,
+            'compute_seconds': self.compute_time,
+        }
+
+    def to_json(self, top: int = 10) -> str:
+        return json.dumps(self.to_dict(top), indent=2)
+
+    def report(self, top: int = 10) -> str:
+        profile = self.to_dict(top)
+        lines = ['{} instructions, {:.6f}s compute, {:.6f}s waiting on input ({} stalls)'.format(
+            profile['instructions'], profile['compute_seconds'],
+            profile['input_wait_seconds'], profile['input_stalls'])]
+
+        lines.append('')
+        lines.append('operation               count')
+        for name, count in profile['operations'].items():
+            lines.append('{:<20} {:>8}'.format(name, count))
+
+        lines.append('')
+        lines.append('address    count  taken  not taken')
+        for hot in profile['hot_addresses']:
+            address = hot['address']
+            jumps = profile['jumps'].get(str(address))
+            if jumps:
+                lines.append('{:>7} {:>8} {:>6} {:>10}'.format(
+                    address, hot['count'], jumps['taken'], jumps['not_taken']))
+            else:
+                lines.append('{:>7} {:>8}'.format(address, hot['count']))
+
+        lines.append('')
+        lines.append('loop          iterations  instructions')
+        for loop in profile['hot_loops']:
+            lines.append('{:>5}-{:<5} {:>12} {:>13}'.format(
+                loop['start'], loop['end'], loop['iterations'], loop['instructions']))
+        return '\n'.join(lines)